@@ -1,18 +1,16 @@
-import pandas as pd
-import joblib
+import json
 import os
 import streamlit as st
-import streamlit.components.v1 as components
-import time
-import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler, OneHotEncoder
-from sklearn.impute import SimpleImputer
-from sklearn.compose import ColumnTransformer
-from sklearn.decomposition import PCA
-from sklearn.metrics.pairwise import cosine_similarity
+
+# Only what the landing page needs is imported up front; pandas, sklearn,
+# Plotly and the model are imported where they are used (and pre-loaded by
+# the warm-up thread started at the end of the first run).
+from assets import optimized_image
+from audit import AUDIT_LOG, audit
+from instrumentation import STATS, Trace, profiling_enabled
+from result_cache import RESULT_CACHE, result_key
+from schema import CATEGORICAL, input_frame, load_manifest, validate_manifest
+from warmup import start_warmup, warmup_status
 
 # Configure page
 st.set_page_config(
@@ -21,39 +19,6 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded"
 )
-# Rotating dots HTML
-rotating_dots = """
-<div class="loading-dots">
-  <span></span><span></span><span></span><span></span>
-</div>
-
-<style>
-.loading-dots {
-  display: flex;
-  justify-content: center;
-  align-items: center;
-  height: 80px;
-}
-.loading-dots span {
-  width: 12px;
-  height: 12px;
-  margin: 0 6px;
-  background: #3498db;
-  border-radius: 50%;
-  animation: loading-dots 1s infinite ease-in-out;
-}
-.loading-dots span:nth-child(1) { animation-delay: 0s; }
-.loading-dots span:nth-child(2) { animation-delay: 0.2s; }
-.loading-dots span:nth-child(3) { animation-delay: 0.4s; }
-.loading-dots span:nth-child(4) { animation-delay: 0.6s; }
-
-@keyframes loading-dots {
-  0%, 80%, 100% { transform: scale(0.8); opacity: 0.6; }
-  40% { transform: scale(1.2); opacity: 1; }
-}
-</style>
-"""
-
 # Custom CSS for modern design
 st.markdown("""
 <style>
@@ -118,37 +83,6 @@ st.markdown("""
         color: #2d3436;
     }
     
-    .stTabs [data-baseweb="tab-list"] {
-        gap: 8px;
-        background-color: #f8f9fa;
-        padding: 0.5rem 2rem;
-        border-radius: 15px;
-        margin-bottom: 0.5rem;
-    }
-    
-    .stTabs [data-baseweb="tab"] {
-        height: 60px;
-        border-radius: 12px;
-        background-color: white;
-        border: 2px solid #e9ecef;
-        color: #495057;
-        font-weight: 700;
-        padding: 0 1.5rem;
-        transition: all 0.3s ease;
-    }
-    
-    .stTabs [aria-selected="true"] {
-        background-color: #007bff;
-        color: white;
-        border-color: #007bff;
-        box-shadow: 0 4px 8px rgba(0,123,255,0.3);
-        font-weight: 700;
-    }
-    
-    .stTabs [role="tabpanel"] {
-        padding-top: 0.5rem;
-    }
-    
     .dataset-section {
         background: #f8f9fa;
         padding: 2rem;
@@ -178,6 +112,7 @@ heartimage = os.path.join(mainpath, r'heart.png')
 neg = os.path.join(mainpath, r'neg.jpg')
 pos = os.path.join(mainpath, r'pos.jpg')
 compare = os.path.join(mainpath, r'Comparison.jpg')
+metrics_path = os.path.join(mainpath, r'metrics.json')
 pcaimage = os.path.join(mainpath, r'PCA.jpg')
 
 # Header section with titles on left, heart image on right
@@ -186,15 +121,17 @@ with col1:
     st.title("MyHeartRisk")
     st.subheader("Standardized WebApp to Predict Coronary Artery Disease Based on Real World Hospital Case/Control Data")
 with col2:
-    st.image(heartimage, width=120)
+    st.image(optimized_image(heartimage), width=120)
 
-# Load dataset first to get predict_btn status
-data_path = os.path.join(mainpath, r'Data_health1.xlsx')
-df = pd.read_excel(data_path)
+# Per-stage timings are opt-in: MYHEARTRISK_PROFILE=1 or ?debug=1
+debug_mode = profiling_enabled() or st.query_params.get("debug") == "1"
 
-# Separate features and target
-X = df.drop(columns=['Target'])  # make sure 'Target' is the correct target column
-features = X.columns
+# The sidebar is driven by the precomputed schema manifest; the cohort itself
+# is only loaded once an analysis is requested
+data_path = os.path.join(mainpath, r'Data_health1.xlsx')
+manifest = load_manifest(os.path.join(mainpath, r'schema.json'))
+columns = {column["name"]: column for column in manifest["columns"]}
+features = list(columns)
 
 # Modern Sidebar Design
 with st.sidebar:
@@ -219,9 +156,9 @@ with st.sidebar:
             break
     
     if age_col:
-        min_val = int(X[age_col].min())
-        max_val = int(X[age_col].max())
-        mean_val = int(round(X[age_col].mean()))
+        min_val = int(columns[age_col]["min"])
+        max_val = int(columns[age_col]["max"])
+        mean_val = int(round(columns[age_col]["default"]))
         user_data[age_col] = st.slider(
             f"**{age_col} (years)**", 
             min_val, max_val, mean_val,
@@ -234,14 +171,11 @@ with st.sidebar:
    
     
     # Handle categorical features
-    categorical_features = []
-    for col in features:
-        if not pd.api.types.is_numeric_dtype(X[col]):
-            categorical_features.append(col)
+    categorical_features = [col for col in features if columns[col]["kind"] == CATEGORICAL]
     
     if categorical_features:
         for col in categorical_features:
-            unique_vals = X[col].dropna().unique()
+            unique_vals = columns[col]["levels"]
             user_data[col] = st.selectbox(
                 f"**{col}**", 
                 unique_vals,
@@ -259,8 +193,16 @@ with st.sidebar:
         help="Click to get your heart disease risk assessment"
     )
 
+# Only one view is rendered per rerun (st.tabs would execute every tab body).
+# Analyze switches to the report, which stays up until the inputs change.
+VIEWS = ["Report Dashboard", "Dataset", "Model Performance", "Feature Analysis"]
+if predict_btn:
+    st.session_state["view"] = VIEWS[0]
+    st.session_state["analyzed_inputs"] = dict(user_data)
+show_report = st.session_state.get("analyzed_inputs") == user_data
+
 # Show instruction card only when analysis hasn't started
-if not predict_btn:
+if not show_report:
     st.markdown("""
     <div class="instruction-card">
         <h3>🎯 How to Use This App</h3>
@@ -273,241 +215,228 @@ if not predict_btn:
     </div>
     """, unsafe_allow_html=True)
 
-# Convert input into DataFrame
-input_df = pd.DataFrame([user_data])
-
-# Load model
 model_path = os.path.join(mainpath, r'model.joblib')
-model = joblib.load(model_path)
-
-# Show tabs and content only when analysis starts
-tab1, tab2, tab3, tab4 = st.tabs(["Report Dashboard", "Dataset", "Model Performance", "Feature Analysis"])
-
-if predict_btn:
-  
-    placeholder = st.empty()
-    with placeholder.container():
-        components.html(rotating_dots, height=100)
-    
-    # long processing
-    time.sleep(2)
-    
-    # remove the whole container
-    placeholder.empty()
-
-   
-    
-    # Prediction only on button click
-    with tab1:
-        st.markdown("## Report Dashboard")
+# MYHEARTRISK_SCORER=numpy scores with the compiled linear model instead of the sklearn pipeline
+use_numpy_scorer = os.environ.get("MYHEARTRISK_SCORER", "sklearn") == "numpy"
+
+
+def load_model():
+    """The current model (unpickled once per process, reloaded when the file changes).
+
+    Stops the page if the schema manifest does not describe its inputs.
+    """
+    from model_registry import get_registry
+    registry = get_registry(model_path)
+    model_info = registry.current()
+    try:
+        validate_manifest(manifest, model_info.model)
+    except ValueError as exc:
+        st.error(f"{exc}. Regenerate it with `python schema.py`.")
+        st.stop()
+    return registry, model_info
+
+
+@st.fragment
+def cohort_explorer():
+    """The Cohort Explorer; its widgets rerun only this fragment, not the whole page."""
+    # Every widget change is answered from the precomputed count cube, not the raw cohort
+    from cohort_cube import load_cube
+    cube = load_cube(data_path)
+    st.markdown("### 📊 Cohort Explorer")
+    explore_col1, explore_col2 = st.columns(2)
+    with explore_col1:
+        cube_feature = st.selectbox("Feature", cube.features, key="cube_feature")
+        cube_filter = st.selectbox("Only patients with", ["Everyone"] + [f for f in cube.features if f != cube_feature],
+                                   key="cube_filter")
+    with explore_col2:
+        first_band, last_band = st.select_slider("Age band", options=cube.bands,
+                                                 value=(cube.bands[0], cube.bands[-1]), key="cube_bands")
+        where = None
+        if cube_filter != "Everyone":
+            where = (cube_filter, st.selectbox(cube_filter, cube.levels[cube.features.index(cube_filter)],
+                                               key="cube_filter_level"))
+    bands = slice(cube.bands.index(first_band), cube.bands.index(last_band) + 1)
+    prevalence = cube.prevalence(cube_feature, bands, where)
+    cases, controls = cube.group_totals(bands, where)
+    st.bar_chart(prevalence, x="Level", y=["Cases (%)", "Controls (%)"], stack=False,
+                 color=["#ff6b6b", "#51cf66"])
+    st.dataframe(prevalence, hide_index=True, use_container_width=True)
+    st.caption(f"Share of the {cases:,} cases and {controls:,} controls in this selection "
+               f"with each level of {cube_feature}.")
+
+st.session_state.setdefault("view", VIEWS[0])
+view = st.radio("View", VIEWS, key="view", horizontal=True, label_visibility="collapsed")
+
+if view == VIEWS[0] and show_report:
+    from charts import pca_figure
+    from report_pipeline import start_report
+    
+    trace = Trace("report", enabled=debug_mode)
+    registry, model_info = load_model()
+    model = model_info.model
+    # Convert input into DataFrame (manifest column order and dtypes)
+    input_df = input_frame(manifest, user_data)
+    
+    # The cohort-dependent stages start in the background straight away;
+    # the risk card only needs the model
+    job = start_report(data_path, user_data, input_df, trace)
+    try:
+        with trace.stage("first_result"):
+            # Identical submissions (from any session) are served from the result cache
+            cache_key = result_key(user_data, model_info.version, None, stage="prediction")
+            result = RESULT_CACHE.get(cache_key)
+            if result is None:
+                with trace.stage("predict"):
+                    if use_numpy_scorer:
+                        from linear_scorer import load_scorer
+                        probabilities = load_scorer(model_info).predict_proba_dict(user_data)
+                    else:
+                        probabilities = model.predict_proba(input_df)[0]
+                result = {
+                    "prediction": model.classes_[probabilities.argmax()],
+                    "probabilities": probabilities,
+                }
+                RESULT_CACHE.put(cache_key, result)
+            
+            prediction = result["prediction"]
+            probabilities = result["probabilities"]
+            if predict_btn:
+                # Every submission is audited; re-displays of the same report are not
+                audit(user_data, prediction, probabilities, model_info.version, source="app")
+            
+            st.markdown("## Report Dashboard")
+            
+            # Create columns for better layout
+            col1, col2 = st.columns([2, 1])
+        
+            with col1:
+                if prediction == 1:
+                    st.markdown("""
+                    <div class="positive-result">
+                        <h2>⚠️ Higher Risk Detected</h2>
+                        <p style="font-size: 1.2rem; margin-bottom: 1rem;">Your health parameters show similarities to patients diagnosed with Coronary Artery Disease.</p>
+                        <p style="font-size: 1rem; opacity: 0.9;">
+                            <strong>Recommendation:</strong> Please consult with a healthcare professional for a comprehensive evaluation.
+                        </p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                    confidence = probabilities[1] * 100
+                    risk_level = "HIGH"
+                    risk_color = "#ff6b6b"
+                else:
+                    st.markdown("""
+                    <div class="negative-result">
+                        <h2>✅ Lower Risk Indicated</h2>
+                        <p style="font-size: 1.2rem; margin-bottom: 1rem;">Your health parameters suggest a lower likelihood of Coronary Artery Disease.</p>
+                        <p style="font-size: 1rem; opacity: 0.9;">
+                            <strong>Recommendation:</strong> Continue maintaining a healthy lifestyle and regular check-ups.
+                        </p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                    confidence = probabilities[0] * 100
+                    risk_level = "LOW"
+                    risk_color = "#51cf66"
         
-        with st.spinner(" Analyzing your health parameters..."):
-            prediction = model.predict(input_df)[0]
-            probabilities = model.predict_proba(input_df)[0]
+      
         
-        # Create columns for better layout
-        col1, col2 = st.columns([2, 1])
         
-        with col1:
-            if prediction == 1:
-                st.markdown("""
-                <div class="positive-result">
-                    <h2>⚠️ Higher Risk Detected</h2>
-                    <p style="font-size: 1.2rem; margin-bottom: 1rem;">Your health parameters show similarities to patients diagnosed with Coronary Artery Disease.</p>
-                    <p style="font-size: 1rem; opacity: 0.9;">
-                        <strong>Recommendation:</strong> Please consult with a healthcare professional for a comprehensive evaluation.
-                    </p>
-                </div>
-                """, unsafe_allow_html=True)
-                confidence = probabilities[1] * 100
-                risk_level = "HIGH"
-                risk_color = "#ff6b6b"
-            else:
-                st.markdown("""
-                <div class="negative-result">
-                    <h2>✅ Lower Risk Indicated</h2>
-                    <p style="font-size: 1.2rem; margin-bottom: 1rem;">Your health parameters suggest a lower likelihood of Coronary Artery Disease.</p>
-                    <p style="font-size: 1rem; opacity: 0.9;">
-                        <strong>Recommendation:</strong> Continue maintaining a healthy lifestyle and regular check-ups.
+            with col2:
+                # Confidence metrics card
+                st.markdown(f"""
+                <div class="metric-card">
+                    <h3 style="color: {risk_color}; margin-bottom: 1rem;">🎯 Confidence Score</h3>
+                    <div style="font-size: 2.5rem; font-weight: bold; color: {risk_color};">
+                        {confidence:.1f}%
+                    </div>
+                    <p style="margin-top: 0.5rem; color: #666;">
+                        Risk Level: <strong style="color: {risk_color};">{risk_level}</strong>
                     </p>
                 </div>
                 """, unsafe_allow_html=True)
-                confidence = probabilities[0] * 100
-                risk_level = "LOW"
-                risk_color = "#51cf66"
-        
-      
-        
-        
-        with col2:
-            # Confidence metrics card
-            st.markdown(f"""
-            <div class="metric-card">
-                <h3 style="color: {risk_color}; margin-bottom: 1rem;">🎯 Confidence Score</h3>
-                <div style="font-size: 2.5rem; font-weight: bold; color: {risk_color};">
-                    {confidence:.1f}%
-                </div>
-                <p style="margin-top: 0.5rem; color: #666;">
-                    Risk Level: <strong style="color: {risk_color};">{risk_level}</strong>
-                </p>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        # Progress bar with modern styling
-        st.markdown("### Detailed Analysis")
-        progress_col1, progress_col2 = st.columns([3, 1])
-        
-        with progress_col1:
-            st.progress(confidence/100, text=f"Model Confidence: {confidence:.2f}%")
-        
-        with progress_col2:
-            if confidence >= 80:
-                st.markdown("🟢 **High Confidence**")
-            elif confidence >= 60:
-                st.markdown("🟡 **Medium Confidence**")
-            else:
-                st.markdown("🟠 **Low Confidence**")
         
+            # Progress bar with modern styling
+            st.markdown("### Detailed Analysis")
+            progress_col1, progress_col2 = st.columns([3, 1])
+        
+            with progress_col1:
+                st.progress(confidence/100, text=f"Model Confidence: {confidence:.2f}%")
+        
+            with progress_col2:
+                if confidence >= 80:
+                    st.markdown("🟢 **High Confidence**")
+                elif confidence >= 60:
+                    st.markdown("🟡 **Medium Confidence**")
+                else:
+                    st.markdown("🟠 **Low Confidence**")
+
+        # Which of the user's own inputs moved the score (exact for the linear model)
+        with trace.stage("attribution"):
+            from attribution import TOP_K, load_attribution
+            contributions = load_attribution(model_info, data_path).table(user_data)
+            st.markdown("### What Drove Your Score")
+            raising_col, lowering_col = st.columns(2)
+            for column, title, rows in (
+                (raising_col, "🔴 Raising your risk", contributions[contributions["Contribution"] > 0]),
+                (lowering_col, "🟢 Lowering your risk", contributions[contributions["Contribution"] < 0]),
+            ):
+                with column:
+                    st.markdown(f"#### {title}")
+                    lines = [f"- **{feature}**: {value} ({contribution:+.2f})"
+                             for feature, value, contribution in rows.head(TOP_K).itertuples(index=False)]
+                    st.markdown("\n".join(lines) or "_None_")
+            st.caption("Contributions are in log-odds relative to the average patient in the reference cohort "
+                       "and add up to the difference between your score and that average.")
+
+        # Every single-factor change to the profile, scored in one batch
+        with trace.stage("what_if"):
+            what_if_key = result_key(user_data, model_info.version, None, stage="what_if")
+            what_if = RESULT_CACHE.get(what_if_key)
+            if what_if is None:
+                from what_if import sweep
+                scorer = None
+                if use_numpy_scorer:
+                    from linear_scorer import load_scorer
+                    scorer = load_scorer(model_info)
+                what_if = sweep(model, manifest, user_data, scorer)
+                RESULT_CACHE.put(what_if_key, what_if)
+            with st.expander("🔀 What if...? Risk with one factor changed"):
+                st.caption("Each row changes a single input and keeps the rest of your profile. "
+                           "Changes show the model's estimate, not a guaranteed effect.")
+                st.dataframe(what_if, hide_index=True, use_container_width=True)
+
+
         # Additional insights
         st.markdown("---")
-        df = pd.read_excel(data_path)
-        
-        # -----------------------
-        # Add user input
-        # -----------------------
-        # user_data comes from Streamlit inputs
-        user_df = pd.DataFrame([user_data])
-        user_df["Target"] = -1  # special label for USER
-        df = pd.concat([df, user_df], ignore_index=True)
-        
-        # -----------------------
-        # Identify numerical and categorical columns
-        # -----------------------
-        numerical_cols = df.select_dtypes(include=np.number).columns.tolist()
-        if 'Target' in numerical_cols:
-            numerical_cols.remove('Target')
-        
-        categorical_cols = df.select_dtypes(include='object').columns.tolist()
-        for col in categorical_cols:
-            df[col] = df[col].astype(str)
-        
-        # -----------------------
-        # Preprocess
-        # -----------------------
-        numerical_transformer = Pipeline(steps=[
-            ('imputer', SimpleImputer(strategy='mean')),
-            ('scaler', StandardScaler())
-        ])
-        
-        categorical_transformer = Pipeline(steps=[
-            ('imputer', SimpleImputer(strategy='most_frequent')),
-            ('onehot', OneHotEncoder(handle_unknown='ignore'))
-        ])
-        
-        preprocessor = ColumnTransformer(
-            transformers=[
-                ('num', numerical_transformer, numerical_cols),
-                ('cat', categorical_transformer, categorical_cols)
-            ])
-        
-        df_processed = preprocessor.fit_transform(df)
-        
-        # -----------------------
-        # PCA
-        # -----------------------
-        pca = PCA(n_components=2)
-        pca_result = pca.fit_transform(df_processed)
-        explained_var = pca.explained_variance_ratio_ * 100
-     
-        
-        # -----------------------
-        # Plot in Streamlit
-        # -----------------------
-        fig, ax = plt.subplots(figsize=(8, 6))
-        
-        # Controls (0)
-        ax.scatter(pca_result[df["Target"] == 0, 0],
-                   pca_result[df["Target"] == 0, 1],
-                   c="blue", label="Controls", alpha=0.6)
-        
-        # Cases (1)
-        ax.scatter(pca_result[df["Target"] == 1, 0],
-                   pca_result[df["Target"] == 1, 1],
-                   c="red", label="Cases", alpha=0.6)
-        
-        # User (-1)
-        ax.scatter(pca_result[df["Target"] == -1, 0],
-                   pca_result[df["Target"] == -1, 1],
-                   c="gold", s=100, edgecolor="black", marker="v", label="You")
-        
-        ax.set_xlabel(f"PCA 1 ")
-        ax.set_ylabel(f"PCA 2")
-        ax.set_title("PCA Projection")
-        ax.legend()
-        st.markdown("""
-          <div style="background: #e8f5e8; padding: 1rem; border-radius: 8px;">
-            <p>The Star Represents Your Data Point in Parameteric Space (Cummulative Variance = 37 %)</p>
-        </div>
-        """, unsafe_allow_html=True)
-        st.pyplot(fig, width=800)
-
-        numerical_cols = df.select_dtypes(include=np.number).columns.tolist()
-        categorical_cols = df.select_dtypes(include='object').columns.tolist()
-        
-        # Exclude 'Target' and 'Age' from features for similarity
-        features_for_similarity = [col for col in df.columns if col not in ['Target', 'Age']]
-        
-        # -----------------------
-        # Preprocess data
-        # -----------------------
-        numerical_features = [col for col in features_for_similarity if col in numerical_cols]
-        categorical_features = [col for col in features_for_similarity if col in categorical_cols]
-        
-        # Make sure categorical columns are string
-        for col in categorical_features:
-            df[col] = df[col].astype(str)
-            user_df[col] = user_df[col].astype(str)
-        
-        preprocessor = ColumnTransformer(
-            transformers=[
-                ('num', Pipeline([('imputer', SimpleImputer(strategy='mean')), 
-                                 ('scaler', StandardScaler())]), numerical_features),
-                ('cat', Pipeline([('imputer', SimpleImputer(strategy='most_frequent')), 
-                                  ('onehot', OneHotEncoder(handle_unknown='ignore'))]), categorical_features)
-            ])
-        
-        # Fit on dataset and transform both dataset and user
-        df_features = preprocessor.fit_transform(df[features_for_similarity])
-        user_features = preprocessor.transform(user_df[features_for_similarity])
-        
-        # -----------------------
-        # Compute similarity
-        # -----------------------
-        # Compute similarities (array)
-        similarities = cosine_similarity(user_features, df_features)[0]  # array of similarity with each row
-        
-        # Build results dataframe
-        results = df[['Age', 'Target']].copy()
-        results['Similarity (%)'] = similarities * 100  # keep the array, convert to percentage
-        
-        # Sort by similarity descending
-        results_sorted = results.sort_values(by='Similarity (%)', ascending=False)
         
-        results_sorted['Similarity (%)'] = results_sorted['Similarity (%)'].map(lambda x: f"{x:.2f}")
-        results_sorted['Target'] = results_sorted['Target'].map({0: 'CONTROL', 1: 'CASE'})
-        
-        # Remove only the first row where Target is None
-        if results_sorted['Target'].isna().any():
-            first_none_index = results_sorted[results_sorted['Target'].isna()].index[0]
-            results_sorted = results_sorted.drop(first_none_index).reset_index(drop=True)
-        results_sorted = results_sorted.iloc[1:].reset_index(drop=True)
-        top_n = 10
-        st.subheader(f"Patient Ages Similar To Your Health Parameters (Excluding Age)")
-        top_results = results_sorted.head(top_n)
-        
-        st.dataframe(top_results)
-        
-with tab1:
+        # Filled in as each background stage finishes
+        slots = {"projection": st.empty(), "similarity": st.empty()}
+        slots["projection"].info("Placing you among the reference cohort...")
+        slots["similarity"].info("Finding patients similar to you...")
+        
+        for stage, future in job.as_completed():
+            try:
+                output = future.result()
+            except Exception as exc:
+                slots[stage].error(f"Could not compute this section: {exc}")
+                continue
+            with trace.stage("render"), slots[stage].container():
+                if stage == "projection":
+                    st.markdown(f"""
+                      <div style="background: #e8f5e8; padding: 1rem; border-radius: 8px;">
+                        <p>The Star Represents Your Data Point in Parameteric Space (Cummulative Variance = {output["explained_variance"]:.0f} %)</p>
+                    </div>
+                    """, unsafe_allow_html=True)
+                    st.plotly_chart(pca_figure(output["background"], output["chart"]), use_container_width=False)
+                else:
+                    st.subheader(f"Patient Ages Similar To Your Health Parameters (Excluding Age)")
+                    st.dataframe(output)
+    finally:
+        # A rerun (e.g. the inputs changed) interrupts the script here; drop the stale work
+        job.cancel()
+    
+    trace.finish()
+        
+if view == VIEWS[0]:
        st.markdown("""
     <div style="text-align: center; padding: 1rem; background: linear-gradient(90deg, #ff6b6b, #ee5a6f); border-radius: 10px; margin-bottom: 1rem;">
         <h2 style="color: white; margin: 0;">Welcome to MyHeartRisk</h2>
@@ -526,7 +455,7 @@ with tab1:
 
 
     
-with tab2:
+elif view == VIEWS[1]:
     st.markdown("""
     <div class="dataset-section">
         <h2>Dataset Overview</h2>
@@ -565,7 +494,7 @@ with tab2:
     st.markdown("---")
     
     st.markdown("### Principal Component Analysis")
-    st.image(pcaimage, caption='PCA Visualization: Distribution of Cases vs Controls (Cumulative Variance: 37%)', width=800)
+    st.image(optimized_image(pcaimage), caption='PCA Visualization: Distribution of Cases vs Controls (Cumulative Variance: 37%)', width=800)
     
     st.markdown("""
     <div style="background: #e3f2fd; padding: 1.5rem; border-radius: 10px; margin: 1rem 0;">
@@ -576,7 +505,12 @@ with tab2:
     </div>
     """, unsafe_allow_html=True)
 
-with tab3:
+elif view == VIEWS[2]:
+    registry, model_info = load_model()
+    metrics = None
+    if os.path.exists(metrics_path):
+        with open(metrics_path, encoding="utf-8") as fh:
+            metrics = json.load(fh)
     st.markdown("""
     <div class="dataset-section">
         <h2> Deployed Model</h2>
@@ -585,11 +519,23 @@ with tab3:
         </p>
     </div>
     """, unsafe_allow_html=True)
+    st.caption(
+        f"Model version {model_info.version} · loaded in {model_info.load_seconds * 1000:.1f} ms "
+        f"· {registry.loads} load(s) in this process"
+    )
     st.markdown("""
         ### Comparative Analysis
         *5 K-Fold Stratified Cross Validation*
         """)
-    st.image(compare, caption=' Comprehensive Model Comparison (10 Models with 5-Fold Stratified Cross-Validation)', width=800)
+    st.image(optimized_image(compare), caption=' Comprehensive Model Comparison (10 Models with 5-Fold Stratified Cross-Validation)', width=800)
+    
+    if metrics:
+        import pandas as pd
+        with st.expander("Reproduced comparison (from `python train.py`)"):
+            st.dataframe(pd.DataFrame({
+                name: {metric: f"{v['mean']:.2f} ± {v['std']:.2f}" for metric, v in scores.items()}
+                for name, scores in metrics["comparison"]["models"].items()
+            }).T)
     
     st.markdown("---")
     
@@ -601,13 +547,21 @@ with tab3:
         *5x2 K-Fold Stratified Cross Validation*
         """)
         
+        # Produced by train.py; the published figures are the fallback
+        internal = metrics["internal_validation"] if metrics else None
+        
+        def cv_metric(name, fallback):
+            if internal is None:
+                return fallback
+            return f"{internal[name]['mean']:.2f} ± {internal[name]['std']:.2f}"
+        
         metrics_col1, metrics_col2 = st.columns(2)
         with metrics_col1:
-            st.metric(" Accuracy", "0.94 ± 0.01")
-            st.metric(" Sensitivity", "0.92 ± 0.04")
+            st.metric(" Accuracy", cv_metric("accuracy", "0.94 ± 0.01"))
+            st.metric(" Sensitivity", cv_metric("sensitivity", "0.92 ± 0.04"))
         with metrics_col2:
-            st.metric(" Specificity", "0.95 ± 0.03")
-            st.metric(" MCC", "0.88 ± 0.02")
+            st.metric(" Specificity", cv_metric("specificity", "0.95 ± 0.03"))
+            st.metric(" MCC", cv_metric("mcc", "0.88 ± 0.02"))
     
     with col2:
         st.markdown("""
@@ -630,7 +584,7 @@ with tab3:
     </div>
     """, unsafe_allow_html=True)
 
-with tab4:
+elif view == VIEWS[3]:
     st.markdown("""
     <div class="interpretation-section">
         <h2> Understanding the Predictions</h2>
@@ -639,12 +593,16 @@ with tab4:
         </p>
     </div>
     """, unsafe_allow_html=True)
-    
+
+    cohort_explorer()
+
+    st.markdown("---")
+
     col1, col2 = st.columns(2)
-    
+
     with col1:
         st.markdown("### 🟢 Protective Factors")
-        st.image(neg, caption='Features Associated with Lower Risk (Controls)')
+        st.image(optimized_image(neg), caption='Features Associated with Lower Risk (Controls)')
         st.markdown("""
         <div style="background: #e8f5e8; padding: 1rem; border-radius: 8px;">
             <p><strong>Bars</strong> represent health parameters that, when present, 
@@ -654,7 +612,7 @@ with tab4:
     
     with col2:
         st.markdown("### 🔴 Risk Factors")
-        st.image(pos, caption='Features Associated with Higher Risk (Cases)')
+        st.image(optimized_image(pos), caption='Features Associated with Higher Risk (Cases)')
         st.markdown("""
         <div style="background: #ffeaea; padding: 1rem; border-radius: 8px;">
             <p><strong>Bars</strong> represent health parameters that, when present, 
@@ -665,83 +623,20 @@ with tab4:
     st.markdown("---")
     
 
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
-
+if debug_mode:
+    import pandas as pd
+    with st.sidebar.expander("⏱️ Stage timings (ms)", expanded=True):
+        summary = STATS.summary()
+        if summary:
+            st.dataframe(pd.DataFrame(summary).T.round(2))
+        else:
+            st.caption("Run an analysis to collect timings.")
+    with st.sidebar.expander("🗃️ Result cache"):
+        st.json(RESULT_CACHE.stats())
+    with st.sidebar.expander("📝 Audit log"):
+        st.json(AUDIT_LOG.stats())
+    with st.sidebar.expander("🔥 Warm-up"):
+        st.json(warmup_status())
+
+# The page is out; load the report path in the background for the first Analyze
+start_warmup(data_path, model_path)
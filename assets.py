@@ -0,0 +1,90 @@
+"""Pre-optimised static images for the app.
+
+The figures shipped with the repo (``PCA.jpg``, ``Comparison.jpg``, ...) are
+much larger than the width they are displayed at.  :func:`optimized_image`
+resizes an image to its display width, re-encodes it as WebP and returns the
+bytes.  Results are cached on disk under ``.cache/assets`` (keyed by the
+source's content hash, width and quality) and in memory, so each image is
+encoded once and read once per process::
+
+    python assets.py            # pre-build the cache and print the savings
+"""
+import io
+import os
+import threading
+
+from PIL import Image
+
+from storage import CACHE_DIR, file_hash
+
+mainpath = os.path.dirname(os.path.abspath(__file__))
+
+FORMAT = "WEBP"
+QUALITY = 80
+
+# Images rendered by app.py and the width (px) each is displayed at
+DISPLAY_WIDTHS = {
+    "heart.png": 120,
+    "PCA.jpg": 800,
+    "Comparison.jpg": 800,
+    "neg.jpg": 600,
+    "pos.jpg": 600,
+}
+
+_lock = threading.Lock()
+_images = {}
+
+
+def asset_cache_path(path, width, quality=QUALITY):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, "assets", f"{stem}-{file_hash(path)[:16]}-w{width}-q{quality}.webp")
+
+
+def encode_image(path, width, quality=QUALITY):
+    """Resize ``path`` to at most ``width`` pixels wide and encode it as WebP."""
+    with Image.open(path) as image:
+        image.load()
+        if image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.LANCZOS)
+        buffer = io.BytesIO()
+        image.save(buffer, FORMAT, quality=quality, method=6)
+    return buffer.getvalue()
+
+
+def optimized_image(path, width=None, quality=QUALITY):
+    """Return the display-ready bytes for ``path``, encoding them at most once."""
+    path = os.path.abspath(path)
+    width = width or DISPLAY_WIDTHS.get(os.path.basename(path), 800)
+    key = (path, os.stat(path).st_mtime_ns, width, quality)
+    data = _images.get(key)
+    if data is not None:
+        return data
+    with _lock:
+        data = _images.get(key)
+        if data is not None:
+            return data
+        cached = asset_cache_path(path, width, quality)
+        if os.path.exists(cached):
+            with open(cached, "rb") as fh:
+                data = fh.read()
+        else:
+            data = encode_image(path, width, quality)
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            tmp = f"{cached}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, cached)
+        _images[key] = data
+        return data
+
+
+if __name__ == "__main__":
+    total_before = total_after = 0
+    for name, width in DISPLAY_WIDTHS.items():
+        path = os.path.join(mainpath, name)
+        before, after = os.path.getsize(path), len(optimized_image(path, width))
+        total_before += before
+        total_after += after
+        print(f"{name:<16} {before:>9,} B -> {after:>8,} B  (width {width}px)")
+    print(f"{'total':<16} {total_before:>9,} B -> {total_after:>8,} B")
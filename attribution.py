@@ -0,0 +1,106 @@
+"""Exact per-patient risk attribution for the deployed linear model.
+
+The pipeline is linear in its encoded inputs, so its logit is a sum of one
+term per feature (see :meth:`linear_scorer.LinearScorer.feature_terms`).  The
+contribution of feature *j* for a patient is that term minus its average over
+the reference cohort::
+
+    phi_j(x) = term_j(x) - mean over cohort of term_j
+
+which is exactly the Shapley value of the linear model with the cohort as
+background (no sampling, O(features) per patient).  The contributions add up
+to the patient's logit minus :attr:`Attribution.base_value`, the cohort's
+average logit.  ``python -m benchmarks.attribution`` compares this with a
+sampling-based Shapley estimate.
+
+The cohort averages depend only on the model and cohort versions, so they
+are computed once per host and kept under ``.cache/attribution``; app
+processes load a few hundred bytes instead of the cohort frame.
+"""
+import os
+import threading
+
+import numpy as np
+
+from cohort import CACHE_DIR, DEFAULT_DATA_PATH, TARGET, cohort_version, read_cohort
+
+# Bump when the baseline computation changes so stale caches are not reused.
+BASELINE_FORMAT = 1
+TOP_K = 5
+
+_lock = threading.Lock()
+_attributions = {}
+
+
+class Attribution:
+    """Per-feature logit contributions of a :class:`LinearScorer` relative to a background cohort."""
+
+    def __init__(self, scorer, expected):
+        self.scorer = scorer
+        self.features = scorer.term_features
+        self.expected = np.asarray(expected, dtype=np.float64)
+        self.base_value = scorer.intercept + float(self.expected.sum())
+
+    @classmethod
+    def from_background(cls, scorer, background):
+        """Attribution relative to the average terms of the ``background`` DataFrame."""
+        return cls(scorer, scorer.feature_terms(background).mean(axis=0))
+
+    def explain(self, rows):
+        """Contributions for a DataFrame of patients, shape ``(rows, features)``."""
+        return self.scorer.feature_terms(rows) - self.expected
+
+    def explain_dict(self, row):
+        """Contributions for one patient given as ``{feature: value}``."""
+        return self.scorer.feature_terms_dict(row) - self.expected
+
+    def table(self, row):
+        """The report table for one patient: features by decreasing absolute contribution."""
+        import pandas as pd
+
+        contributions = self.explain_dict(row)
+        table = pd.DataFrame({
+            "Feature": self.features,
+            "Your value": [str(row.get(feature)) for feature in self.features],
+            "Contribution": contributions,
+        })
+        order = np.argsort(-np.abs(contributions), kind="stable")
+        return table.iloc[order].reset_index(drop=True)
+
+
+def _baseline_path(model_version, data_version):
+    return os.path.join(CACHE_DIR, "attribution", f"{model_version[:16]}-{data_version[:16]}-v{BASELINE_FORMAT}.npz")
+
+
+def _cached_baseline(path, scorer, data_path):
+    """The cohort's average terms for ``scorer``, computed only on a cache miss."""
+    if os.path.exists(path):
+        with np.load(path, allow_pickle=False) as data:
+            if list(data["features"]) == scorer.term_features:
+                return data["expected"]
+    expected = Attribution.from_background(scorer, read_cohort(data_path).drop(columns=TARGET)).expected
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp, expected=expected, features=np.array(scorer.term_features))
+    os.replace(tmp, path)
+    return expected
+
+
+def load_attribution(loaded_model, data_path=DEFAULT_DATA_PATH):
+    """The :class:`Attribution` for a registry ``LoadedModel`` against the cohort at ``data_path``.
+
+    Built once per model and cohort version; the cohort is read only when
+    the baseline is not cached yet.
+    """
+    from linear_scorer import load_scorer
+
+    key = (loaded_model.version, cohort_version(data_path))
+    attribution = _attributions.get(key)
+    if attribution is None:
+        with _lock:
+            attribution = _attributions.get(key)
+            if attribution is None:
+                scorer = load_scorer(loaded_model)
+                expected = _cached_baseline(_baseline_path(*key), scorer, data_path)
+                attribution = _attributions[key] = Attribution(scorer, expected)
+    return attribution
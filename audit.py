@@ -0,0 +1,157 @@
+"""Append-only audit trail of every risk assessment.
+
+Each submission (the sidebar inputs, the prediction and its probabilities)
+becomes one JSON line.  :meth:`AuditLog.log` only enqueues the record; a
+background thread writes queued records in batches, fsyncs once per batch and
+rotates the file by size (``requests.jsonl`` -> ``requests.jsonl.1`` ...), so
+the request path never waits on the disk::
+
+    audit(user_data, prediction, probabilities, model_version, source="app")
+
+The log defaults to ``logs/requests.jsonl``.  Environment overrides:
+``MYHEARTRISK_AUDIT=0`` (disable), ``MYHEARTRISK_AUDIT_PATH``,
+``MYHEARTRISK_AUDIT_MAX_MB`` and ``MYHEARTRISK_AUDIT_BACKUPS``.
+``python -m benchmarks.replay`` replays the files as load.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+from result_cache import plain_value
+
+mainpath = os.path.dirname(os.path.abspath(__file__))
+AUDIT_PATH = os.environ.get("MYHEARTRISK_AUDIT_PATH", os.path.join(mainpath, "logs", "requests.jsonl"))
+MAX_BYTES = int(float(os.environ.get("MYHEARTRISK_AUDIT_MAX_MB", 64)) * 1024 * 1024)
+BACKUPS = int(os.environ.get("MYHEARTRISK_AUDIT_BACKUPS", 5))
+FLUSH_INTERVAL = 0.5
+BATCH_SIZE = 512
+QUEUE_SIZE = 100_000
+
+
+def audit_enabled():
+    return os.environ.get("MYHEARTRISK_AUDIT", "1").lower() not in ("0", "false", "no")
+
+
+def audit_record(user_data, prediction, probabilities, model_version, source):
+    """The JSON-serialisable audit entry for one assessment."""
+    return {
+        "ts": time.time(),
+        "id": uuid.uuid4().hex[:12],
+        "source": source,
+        "model_version": model_version,
+        "inputs": {str(k): plain_value(v) for k, v in user_data.items()},
+        "prediction": plain_value(prediction),
+        "probabilities": {"control": float(probabilities[0]), "case": float(probabilities[1])},
+    }
+
+
+def rotated_paths(path=AUDIT_PATH, backups=BACKUPS):
+    """Existing log files for ``path``, oldest first."""
+    candidates = [f"{path}.{i}" for i in range(backups, 0, -1)] + [path]
+    return [p for p in candidates if os.path.exists(p)]
+
+
+class AuditLog:
+    """JSONL writer fed by a queue and drained by a background thread."""
+
+    def __init__(self, path=AUDIT_PATH, max_bytes=MAX_BYTES, backups=BACKUPS,
+                 flush_interval=FLUSH_INTERVAL, batch_size=BATCH_SIZE, queue_size=QUEUE_SIZE):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.rotations = 0
+        self.errors = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._closed = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def log(self, record):
+        """Enqueue ``record`` without blocking; it is dropped (and counted) if the queue is full."""
+        if self._thread is None:
+            self._start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def _start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-log", daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        while not (self._closed.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            except OSError:
+                # A full or failing disk must not kill the writer; the batch is lost
+                self.errors += 1
+
+    def _write(self, batch):
+        data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch).encode("utf-8")
+        if os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+            self._rotate()
+        with open(self.path, "ab") as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        self.written += len(batch)
+        self.batches += 1
+
+    def _rotate(self):
+        if self.backups <= 0:
+            os.remove(self.path)
+        else:
+            for i in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{i}"):
+                    os.replace(f"{self.path}.{i}", f"{self.path}.{i + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        self.rotations += 1
+
+    def close(self, timeout=5.0):
+        """Write out everything queued so far and stop the writer thread."""
+        self._closed.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "errors": self.errors,
+        }
+
+
+AUDIT_LOG = AuditLog()
+
+
+def audit(user_data, prediction, probabilities, model_version, source):
+    """Record one assessment in :data:`AUDIT_LOG` (no-op when auditing is disabled)."""
+    if audit_enabled():
+        AUDIT_LOG.log(audit_record(user_data, prediction, probabilities, model_version, source))
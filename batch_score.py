@@ -0,0 +1,200 @@
+"""Headless batch scoring of patient files.
+
+Scores a CSV, Parquet, Excel or SQLite file with the deployed ``model.joblib`` using
+the same feature schema as the sidebar (``schema.json``)
+and writes predictions and class probabilities next to the input columns::
+
+    python batch_score.py patients.csv scored.parquet --workers 8
+    python batch_score.py patients.csv scored.parquet --explain   # + per-feature contributions
+
+``--explain`` adds one ``contribution: <feature>`` column per feature (exact
+log-odds contributions, see :mod:`attribution`).
+
+The input is streamed in chunks, so memory stays bounded by the chunk size;
+with more than one worker, chunks are scored in a process pool.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cohort_sources import DEFAULT_CHUNKSIZE, iter_chunks
+from linear_scorer import load_scorer
+from model_registry import DEFAULT_MODEL_PATH, get_registry
+from schema import DEFAULT_SCHEMA_PATH, categorical_features, feature_names, load_manifest, validate_manifest
+
+
+def feature_schema(schema_path=DEFAULT_SCHEMA_PATH):
+    """Return ``(features, categorical_features)`` from the sidebar's schema manifest."""
+    manifest = load_manifest(schema_path)
+    return feature_names(manifest), categorical_features(manifest)
+
+
+# -----------------------
+# Writers
+# -----------------------
+class _CsvWriter:
+    def __init__(self, path):
+        self.path = path
+        self.first = True
+
+    def write(self, frame):
+        frame.to_csv(self.path, mode="w" if self.first else "a", header=self.first, index=False)
+        self.first = False
+
+    def close(self):
+        if self.first:
+            open(self.path, "w").close()
+
+
+class _ParquetWriter:
+    def __init__(self, path):
+        self.path = path
+        self.writer = None
+
+    def write(self, frame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.path, table.schema)
+        self.writer.write_table(table.cast(self.writer.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def open_writer(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return _CsvWriter(path)
+    if ext == ".parquet":
+        return _ParquetWriter(path)
+    raise ValueError(f"Unsupported output format '{ext}' (expected .csv or .parquet)")
+
+
+# -----------------------
+# Scoring
+# -----------------------
+def prepare(chunk, features, categorical):
+    """Validate ``chunk`` against the feature schema and coerce categorical values to str."""
+    missing = [col for col in features if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Input is missing feature column(s): {', '.join(missing)}")
+    inputs = chunk[features].copy()
+    for col in categorical:
+        values = inputs[col]
+        inputs[col] = values.astype(str).where(values.notna(), None)
+    return inputs
+
+
+def load_model(model_path, scorer="sklearn", schema_path=DEFAULT_SCHEMA_PATH):
+    """The sklearn pipeline, or its compiled :class:`LinearScorer` for ``scorer='numpy'``."""
+    loaded = get_registry(model_path).current()
+    model = load_scorer(loaded) if scorer == "numpy" else loaded.model
+    validate_manifest(load_manifest(schema_path), model)
+    return model
+
+
+def load_explainer(model_path, data_path=None):
+    """The :class:`attribution.Attribution` for the model at ``model_path``."""
+    from attribution import load_attribution
+    from cohort import DEFAULT_DATA_PATH
+
+    return load_attribution(get_registry(model_path).current(), data_path or DEFAULT_DATA_PATH)
+
+
+def score_frame(model, chunk, features, categorical, explainer=None):
+    """Return ``chunk`` with prediction and probability (and optionally contribution) columns appended."""
+    inputs = prepare(chunk, features, categorical)
+    probabilities = model.predict_proba(inputs)
+    out = chunk.copy()
+    out["prediction"] = model.classes_[probabilities.argmax(axis=1)].astype(int)
+    out["probability_control"] = probabilities[:, 0]
+    out["probability_case"] = probabilities[:, 1]
+    if explainer is not None:
+        contributions = explainer.explain(inputs)
+        for i, feature in enumerate(explainer.features):
+            out[f"contribution: {feature}"] = contributions[:, i]
+    return out
+
+
+_worker = {}
+
+
+def _init_worker(model_path, scorer, schema_path, features, categorical, explain):
+    _worker["model"] = load_model(model_path, scorer, schema_path)
+    _worker["explainer"] = load_explainer(model_path) if explain else None
+    _worker["features"] = features
+    _worker["categorical"] = categorical
+
+
+def _score_in_worker(chunk):
+    return score_frame(_worker["model"], chunk, _worker["features"], _worker["categorical"], _worker["explainer"])
+
+
+def score_file(input_path, output_path, model_path=DEFAULT_MODEL_PATH, schema_path=DEFAULT_SCHEMA_PATH,
+               chunksize=DEFAULT_CHUNKSIZE, workers=1, scorer="sklearn", explain=False):
+    """Score ``input_path`` into ``output_path``; return ``(rows, seconds)``."""
+    start = time.perf_counter()
+    features, categorical = feature_schema(schema_path)
+    chunks = iter_chunks(input_path, chunksize, categorical)
+    writer = open_writer(output_path)
+    rows = 0
+    try:
+        if workers > 1:
+            initargs = (model_path, scorer, schema_path, features, categorical, explain)
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=initargs) as pool:
+                # Keep a bounded number of chunks in flight so memory stays flat.
+                pending = []
+                for chunk in chunks:
+                    pending.append(pool.submit(_score_in_worker, chunk))
+                    if len(pending) >= 2 * workers:
+                        scored = pending.pop(0).result()
+                        writer.write(scored)
+                        rows += len(scored)
+                for future in pending:
+                    scored = future.result()
+                    writer.write(scored)
+                    rows += len(scored)
+        else:
+            model = load_model(model_path, scorer, schema_path)
+            explainer = load_explainer(model_path) if explain else None
+            for chunk in chunks:
+                scored = score_frame(model, chunk, features, categorical, explainer)
+                writer.write(scored)
+                rows += len(scored)
+    finally:
+        writer.close()
+    return rows, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a file of patients with the MyHeartRisk model.")
+    parser.add_argument("input", help="CSV, Parquet, Excel (.xlsx) or SQLite file with one patient per row")
+    parser.add_argument("output", help="Destination .csv or .parquet file")
+    parser.add_argument("--model", default=DEFAULT_MODEL_PATH, help="Model artifact (default: model.joblib)")
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA_PATH, help="Feature schema manifest (default: schema.json)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE, help="Rows per chunk")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (1 scores in-process)")
+    parser.add_argument("--scorer", choices=("sklearn", "numpy"), default="sklearn",
+                        help="'numpy' uses the compiled linear scorer (see linear_scorer.py)")
+    parser.add_argument("--explain", action="store_true",
+                        help="Add exact per-feature log-odds contributions (see attribution.py)")
+    args = parser.parse_args(argv)
+
+    try:
+        rows, seconds = score_file(args.input, args.output, args.model, args.schema,
+                                   args.chunksize, args.workers, args.scorer, args.explain)
+    except ValueError as exc:
+        parser.exit(2, f"error: {exc}\n")
+    rate = rows / seconds if seconds else float("inf")
+    print(f"Scored {rows:,} rows in {seconds:.2f}s ({rate:,.0f} rows/sec) -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
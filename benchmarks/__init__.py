@@ -0,0 +1 @@
+"""Benchmarks for the MyHeartRisk hot paths (run from the repository root)."""
@@ -0,0 +1,140 @@
+"""Equivalence check and benchmark of the bit-packed similarity backend.
+
+    python -m benchmarks.bitset                          # 120 .. 100k patients
+    python -m benchmarks.bitset --scales 1000000 --queries 200
+
+For every scale a synthetic cohort is indexed twice, with the float32
+``brute`` backend (the reference ranking) and with ``bitset``, and each query
+(real cohort rows plus synthetic ones) is checked:
+
+* the popcount cosine of every cohort row equals the float32 dot product
+  within ``--tolerance``;
+* the ``bitset`` top-k is the ``brute`` top-k: the same rows in the same
+  order (ties are broken by row order in both, see
+  :func:`similarity.top_k_scores`) with the same scores.
+
+``tests/test_similarity.py`` runs the same check on the reference cohort.
+
+It also reports the matrix size and the query throughput of both backends.
+The process exits with status 1 if any query is not equivalent.
+"""
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_cohort
+from cohort import TARGET, load_cohort
+from similarity import SimilarityIndex, normalize_rows, unpack_rows
+
+DEFAULT_SCALES = (120, 10_000, 100_000)
+
+
+def full_scores(index, query):
+    """Scores of every cohort row for an encoded ``query`` (the whole search, k = n)."""
+    rows, scores = index.backend.search(query, len(index.matrix))
+    out = np.empty(len(index.matrix), dtype=np.float64)
+    out[rows] = scores
+    return out
+
+
+def check_query(brute, bitset, row, k, tolerance):
+    """Return a description of the first mismatch for ``row``, or None."""
+    float_query = brute.encode(row)[0]
+    packed_query = bitset.encode(row)[0]
+    if not np.allclose(normalize_rows(unpack_rows(bitset.encode(row), len(float_query)))[0], float_query):
+        return "packed query does not decode to the float query"
+    expected = full_scores(brute, float_query)
+    actual = full_scores(bitset, packed_query)
+    worst = float(np.max(np.abs(expected - actual)))
+    if worst > tolerance:
+        return f"score differs by {worst:.2e}"
+
+    brute_rows, brute_top = brute.backend.search(float_query, k)
+    bitset_rows, bitset_top = bitset.backend.search(packed_query, k)
+    if not np.array_equal(brute_rows, bitset_rows):
+        return f"top-{k} rows differ: {brute_rows} vs {bitset_rows}"
+    if not np.allclose(brute_top, bitset_top, atol=tolerance):
+        return f"top-{k} scores differ: {brute_top} vs {bitset_top}"
+    return None
+
+
+def throughput(index, queries, min_seconds=1.0):
+    """Searches per second over pre-encoded ``queries`` (repeated for at least ``min_seconds``)."""
+    done, start = 0, time.perf_counter()
+    while True:
+        for query in queries:
+            index.backend.search(query, 10)
+        done += len(queries)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_seconds:
+            return done / elapsed
+
+
+def run_scale(scale, queries, k, tolerance, seed):
+    frame = synthetic_cohort(scale, seed=seed)
+    reference = load_cohort().frame.drop(columns=TARGET)
+    extra = synthetic_cohort(max(queries - len(reference), 0), seed=seed + 1).drop(columns=TARGET)
+    rows = [reference.iloc[[i]] for i in range(min(queries, len(reference)))]
+    rows += [extra.iloc[[i]] for i in range(len(extra))]
+
+    timings = {}
+    start = time.perf_counter()
+    brute = SimilarityIndex.fit(frame, backend="brute")
+    timings["brute_build_s"] = time.perf_counter() - start
+    start = time.perf_counter()
+    bitset = SimilarityIndex.fit(frame, backend="bitset")
+    timings["bitset_build_s"] = time.perf_counter() - start
+
+    failures = []
+    for i, row in enumerate(rows):
+        problem = check_query(brute, bitset, row, k, tolerance)
+        if problem:
+            failures.append(f"query {i}: {problem}")
+
+    sample = rows[:50]
+    float_queries = [brute.encode(row)[0] for row in sample]
+    packed_queries = [bitset.encode(row)[0] for row in sample]
+    return {
+        "scale": scale,
+        "queries": len(rows),
+        "failures": failures,
+        "brute_matrix_bytes": int(brute.matrix.nbytes),
+        "bitset_matrix_bytes": int(bitset.matrix.nbytes),
+        "brute_qps": throughput(brute, float_queries),
+        "bitset_qps": throughput(bitset, packed_queries),
+        **timings,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check and benchmark the bitset similarity backend.")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)))
+    parser.add_argument("--queries", type=int, default=200, help="Queries checked per scale")
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--tolerance", type=float, default=1e-5, help="Allowed |bitset - brute| score difference")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    for scale in (int(s) for s in args.scales.split(",")):
+        result = run_scale(scale, args.queries, args.k, args.tolerance, args.seed)
+        results.append(result)
+        status = "equivalent" if not result["failures"] else f"{len(result['failures'])} MISMATCHES"
+        print(f"{scale:>9,} rows  {result['queries']} queries {status}  "
+              f"matrix {result['brute_matrix_bytes'] / 2**20:8.1f} -> {result['bitset_matrix_bytes'] / 2**20:6.1f} MiB  "
+              f"search {result['brute_qps']:9.1f} -> {result['bitset_qps']:9.1f} q/s  "
+              f"build {result['brute_build_s']:.2f} / {result['bitset_build_s']:.2f} s", file=sys.stderr)
+        for failure in result["failures"][:5]:
+            print(f"    {failure}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return 1 if any(r["failures"] for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python -m benchmarks.compare OLD.json NEW.json [--threshold 1.2]
+
+Exits with status 1 if any benchmark present in both files got slower by
+more than ``threshold`` (median time ratio NEW/OLD).
+"""
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path, encoding="utf-8") as fh:
+        data = json.load(fh)
+    return data, {(r["benchmark"], r["scale"]): r for r in data["results"]}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files.")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=1.2,
+                        help="Slowdown ratio treated as a regression (default 1.2)")
+    args = parser.parse_args(argv)
+
+    old_meta, old = load(args.old)
+    new_meta, new = load(args.new)
+    print(f"{old_meta['commit']} -> {new_meta['commit']}")
+    print(f"{'benchmark':<24} {'scale':>9} {'old ms':>12} {'new ms':>12} {'ratio':>7}")
+
+    regressions = 0
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key]["median_ms"], new[key]["median_ms"]
+        ratio = after / before if before else float("inf")
+        flag = ""
+        if ratio > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        print(f"{key[0]:<24} {key[1]:>9,} {before:>12.3f} {after:>12.3f} {ratio:>6.2f}x{flag}")
+
+    for key in sorted(old.keys() ^ new.keys()):
+        print(f"{key[0]:<24} {key[1]:>9,} only in {'old' if key in old else 'new'}")
+
+    if regressions:
+        print(f"{regressions} regression(s) above {args.threshold:.2f}x", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Concurrent-session load test of the Streamlit app.
+
+    python -m benchmarks.loadtest --sessions 1,2,4,8 --duration 20
+    python -m benchmarks.loadtest --sessions 4 --think 1.0          # users pause ~1s between actions
+    python -m benchmarks.loadtest --url http://host:8501 --pid 1234  # an already running server
+
+Starts ``streamlit run app.py`` headless on a free port (unless ``--url`` is
+given) and, for each session count N, connects N websocket sessions that
+speak the browser's own protocol, so every rerun goes through the real
+server, script threads and session state of one worker.  Each session loops
+over its sidebar like a user would:
+
+* ``age``     - move the Age slider to a random value;
+* ``select``  - change one categorical select to a random level;
+* ``analyze`` - press "🔍 Analyze Risk";
+
+waiting for the rerun to finish before the next action (plus ``--think``
+seconds, exponentially distributed).  Per session count the report gives
+reruns/sec, rerun latency percentiles (action sent to script finished;
+overall and the median per action), errors (script exceptions or failed
+runs), the server's CPU (% of one core) and its RSS at the end of the step,
+all read from ``/proc`` (Linux only).
+The load generator runs on the same host; its own CPU is reported too, so
+saturation of a small machine is visible.  Submissions are not audited
+unless ``--audit`` is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks.run import ROOT, git_commit
+
+DEFAULT_SESSIONS = (1, 2, 4, 8)
+ACTIONS = {"age": 0.4, "select": 0.4, "analyze": 0.2}
+ANALYZE_LABEL = "🔍 Analyze Risk"
+AGE_LABEL = "Age"
+SIDEBAR = 1  # root container of sidebar deltas
+STARTUP_TIMEOUT = 120
+
+
+# -----------------------
+# Server
+# -----------------------
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port, audit=False):
+    """Launch ``streamlit run app.py`` on ``port`` and wait until it answers its health check."""
+    env = dict(os.environ)
+    if not audit:
+        env["MYHEARTRISK_AUDIT"] = "0"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "streamlit", "run", "app.py", "--server.headless", "true",
+         "--server.port", str(port), "--server.address", "127.0.0.1", "--server.fileWatcherType", "none",
+         "--browser.gatherUsageStats", "false"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"streamlit exited with code {server.returncode}")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_stcore/health", timeout=2) as response:
+                if response.status == 200:
+                    return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"streamlit did not answer on port {port} within {STARTUP_TIMEOUT}s")
+
+
+def process_usage(pid):
+    """``(cpu_seconds, rss_bytes)`` of ``pid`` from ``/proc``."""
+    with open(f"/proc/{pid}/stat", encoding="ascii") as fh:
+        # fields after the parenthesised command name; utime and stime are the 12th and 13th
+        fields = fh.read().rsplit(")", 1)[1].split()
+    cpu = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    with open(f"/proc/{pid}/statm", encoding="ascii") as fh:
+        rss = int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    return cpu, rss
+
+
+# -----------------------
+# Sessions
+# -----------------------
+class Session:
+    """One browser tab: a websocket connection plus the widget values it has set."""
+
+    def __init__(self, url, rng, think=0.0):
+        self.url = url.replace("http", "ws", 1).rstrip("/") + "/_stcore/stream"
+        self.rng = rng
+        self.think = think
+        self.connection = None
+        self.widgets = {}  # label -> (kind, proto) of the last render
+        self.values = {}   # widget id -> (WidgetState field, value)
+        self.latencies = []  # (action, seconds)
+        self.errors = []
+
+    async def connect(self):
+        from tornado.websocket import websocket_connect
+
+        self.connection = await websocket_connect(self.url, subprotocols=["streamlit"])
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+
+    async def rerun(self, trigger=None):
+        """Send the widget values (and a button ``trigger``); wait for the script to finish."""
+        from streamlit.proto.BackMsg_pb2 import BackMsg
+        from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+
+        message = BackMsg()
+        message.rerun_script.query_string = ""
+        message.rerun_script.page_script_hash = ""
+        for widget_id, (field, value) in self.values.items():
+            state = message.rerun_script.widget_states.widgets.add(id=widget_id)
+            if field == "double_array_value":
+                state.double_array_value.data.extend(value)
+            else:
+                setattr(state, field, value)
+        if trigger is not None:
+            message.rerun_script.widget_states.widgets.add(id=trigger, trigger_value=True)
+
+        start = time.perf_counter()
+        await self.connection.write_message(message.SerializeToString(), binary=True)
+        failure = None
+        while True:
+            raw = await self.connection.read_message()
+            if raw is None:
+                raise ConnectionError("server closed the session")
+            forward = ForwardMsg()
+            forward.ParseFromString(raw)
+            kind = forward.WhichOneof("type")
+            if kind == "delta" and forward.delta.WhichOneof("type") == "new_element":
+                element = forward.delta.new_element
+                element_kind = element.WhichOneof("type")
+                if element_kind == "exception":
+                    failure = failure or f"{element.exception.type}: {element.exception.message}"
+                elif element_kind in ("slider", "selectbox", "button") and forward.metadata.delta_path[0] == SIDEBAR:
+                    widget = getattr(element, element_kind)
+                    self.widgets[widget.label] = (element_kind, widget)
+            elif kind == "script_finished":
+                if forward.script_finished != ForwardMsg.FINISHED_SUCCESSFULLY:
+                    failure = failure or ForwardMsg.ScriptFinishedStatus.Name(forward.script_finished)
+                break
+        elapsed = time.perf_counter() - start
+        if failure:
+            self.errors.append(failure)
+        return elapsed
+
+    def _widget(self, kind, label=None):
+        matches = [w for text, (k, w) in self.widgets.items() if k == kind and (label is None or label in text)]
+        return self.rng.choice(matches)
+
+    def next_action(self):
+        """Pick an action, update the widget values; return ``(name, button id or None)``."""
+        action = self.rng.choices(list(ACTIONS), weights=list(ACTIONS.values()))[0]
+        if action == "age":
+            slider = self._widget("slider", AGE_LABEL)
+            self.values[slider.id] = ("double_array_value", [float(self.rng.randint(int(slider.min), int(slider.max)))])
+        elif action == "select":
+            select = self._widget("selectbox")
+            self.values[select.id] = ("string_value", self.rng.choice(list(select.options)))
+        else:
+            return action, self._widget("button", ANALYZE_LABEL).id
+        return action, None
+
+    async def run_until(self, deadline):
+        while time.perf_counter() < deadline:
+            if self.think:
+                await asyncio.sleep(self.rng.expovariate(1 / self.think))
+            action, trigger = self.next_action()
+            self.latencies.append((action, await self.rerun(trigger)))
+
+
+# -----------------------
+# Steps
+# -----------------------
+async def _open_sessions(url, count, think, seed):
+    sessions = [Session(url, random.Random(seed * 1000 + i), think) for i in range(count)]
+    for session in sessions:
+        await session.connect()
+    # The landing page; it discovers the widget ids and is not measured
+    await asyncio.gather(*(session.rerun() for session in sessions))
+    return sessions
+
+
+async def run_step(url, count, duration, think, seed, pid=None):
+    """Drive ``count`` sessions for ``duration`` seconds; return the step's summary."""
+    from instrumentation import percentiles
+
+    sessions = await _open_sessions(url, count, think, seed)
+    try:
+        server_before = process_usage(pid) if pid else None
+        client_before = time.process_time()
+        start = time.perf_counter()
+        await asyncio.gather(*(session.run_until(start + duration) for session in sessions))
+        wall = time.perf_counter() - start
+        client_cpu = time.process_time() - client_before
+        server_after = process_usage(pid) if pid else None
+    finally:
+        for session in sessions:
+            session.close()
+
+    latencies = [seconds * 1000 for session in sessions for _, seconds in session.latencies]
+    by_action = {action: [seconds * 1000 for session in sessions for name, seconds in session.latencies
+                          if name == action] for action in ACTIONS}
+    errors = [error for session in sessions for error in session.errors]
+    summary = {
+        "sessions": count,
+        "reruns": len(latencies),
+        "wall_seconds": wall,
+        "reruns_per_sec": len(latencies) / wall if wall > 0 else 0.0,
+        "latency_ms": {**percentiles(latencies, (50, 90, 99)),
+                       "max": max(latencies, default=0.0),
+                       "mean": sum(latencies) / len(latencies) if latencies else 0.0},
+        "p50_ms_by_action": {action: percentiles(values, (50,)).get("p50") for action, values in by_action.items()},
+        "errors": len(errors),
+        "first_error": errors[0] if errors else None,
+        "client_cpu_percent": client_cpu * 100 / wall if wall > 0 else 0.0,
+    }
+    if server_after is not None:
+        summary["server_cpu_percent"] = (server_after[0] - server_before[0]) * 100 / wall if wall > 0 else 0.0
+        summary["server_rss_mib"] = server_after[1] / 2**20
+    return summary
+
+
+async def _warm(url):
+    """One session's first page and first report: the cold costs, kept out of the steps."""
+    session = Session(url, random.Random(0))
+    await session.connect()
+    try:
+        first_page = await session.rerun()
+        first_report = await session.rerun(session._widget("button", ANALYZE_LABEL).id)
+    finally:
+        session.close()
+    return {"first_page_s": first_page, "first_report_s": first_report, "errors": session.errors}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the Streamlit app with concurrent sessions.")
+    parser.add_argument("--sessions", default=",".join(map(str, DEFAULT_SESSIONS)),
+                        help="Comma-separated concurrent session counts")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds per session count")
+    parser.add_argument("--think", type=float, default=0.0, help="Mean pause between a session's actions (s)")
+    parser.add_argument("--url", help="Test a running server (e.g. http://localhost:8501) instead of starting one")
+    parser.add_argument("--pid", type=int, help="With --url: the server's pid, for CPU and RSS")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--audit", action="store_true", help="Audit the sessions' submissions")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url:
+        url, pid = args.url, args.pid
+    else:
+        port = free_port()
+        server = start_server(port, args.audit)
+        url, pid = f"http://127.0.0.1:{port}", server.pid
+    try:
+        warm = asyncio.run(_warm(url))
+        print(f"cold: first page {warm['first_page_s']:.2f}s, first report {warm['first_report_s']:.2f}s",
+              file=sys.stderr)
+        print(f"{'sessions':>8}{'reruns':>8}{'reruns/s':>10}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}"
+              f"{'errors':>8}{'server CPU%':>13}{'RSS MiB':>9}{'client CPU%':>13}", file=sys.stderr)
+        steps = []
+        for count in (int(s) for s in args.sessions.split(",")):
+            step = asyncio.run(run_step(url, count, args.duration, args.think, args.seed, pid))
+            steps.append(step)
+            latency = step["latency_ms"]
+            print(f"{count:>8}{step['reruns']:>8}{step['reruns_per_sec']:>10.1f}{latency.get('p50', 0):>9.0f}"
+                  f"{latency.get('p90', 0):>9.0f}{latency.get('p99', 0):>9.0f}{latency['max']:>9.0f}"
+                  f"{step['errors']:>8}{step.get('server_cpu_percent', float('nan')):>13.0f}"
+                  f"{step.get('server_rss_mib', float('nan')):>9.0f}{step['client_cpu_percent']:>13.0f}",
+                  file=sys.stderr)
+            print("         p50 ms by action: " + ", ".join(
+                f"{action} {ms:.0f}" for action, ms in step["p50_ms_by_action"].items() if ms is not None),
+                file=sys.stderr)
+            if step["first_error"]:
+                print(f"  first error: {step['first_error']}", file=sys.stderr)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": time.time(),
+        "cpu_count": os.cpu_count(),
+        "url": args.url or "local",
+        "duration": args.duration,
+        "think": args.think,
+        "cold": warm,
+        "steps": steps,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
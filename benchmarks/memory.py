@@ -0,0 +1,141 @@
+"""Resident memory of the cohort with N simulated sessions per process.
+
+    python -m benchmarks.memory --scale 100000 --sessions 8 --processes 2
+
+Every mode starts ``--processes`` app-like worker processes, each serving
+``--sessions`` simulated sessions that each run one similar-patients query
+and one projection on a synthetic cohort:
+
+* ``per_session`` - every session builds its own frame, encoded matrix and
+  projection (what the app did before results were shared);
+* ``per_process`` - sessions share one in-process copy, but every process
+  still builds its own;
+* ``store``       - sessions and processes map the shared :mod:`cohort_store`.
+
+Memory is read from ``/proc/self/smaps_rollup`` after all processes have
+loaded (so shared pages are counted once in PSS) and reported as the growth
+over each process's post-import baseline.  Linux only.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+
+MODES = ("per_session", "per_process", "store")
+
+
+def memory_usage():
+    """``{"rss", "pss", "uss"}`` in bytes for the current process."""
+    fields = {}
+    with open("/proc/self/smaps_rollup", encoding="ascii") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _worker(mode, data_path, sessions, loaded, release, results):
+    import gc
+
+    import pandas as pd
+    import pyarrow.parquet  # noqa: F401  (imported lazily by the snapshot; keep it out of the growth)
+
+    from cohort import load_cohort
+    from cohort_store import load_store
+    from projection import Projection
+    from similarity import SimilarityIndex
+
+    gc.collect()
+    baseline = memory_usage()
+    if mode == "store":
+        shared = load_store(data_path)
+    elif mode == "per_process":
+        frame = load_cohort(data_path).frame
+        shared = (SimilarityIndex.fit(frame), Projection.fit(frame))
+
+    held = []
+    for _ in range(sessions):
+        if mode == "per_session":
+            frame = pd.read_csv(data_path)
+            index, projection = SimilarityIndex.fit(frame), Projection.fit(frame)
+            held.append((frame, index, projection))
+        elif mode == "store":
+            index, projection = shared.index(), shared.projection
+        else:
+            index, projection = shared
+        row = pd.read_csv(data_path, nrows=1).drop(columns="Target")
+        index.top_k(row, k=10)
+        projection.transform(row)
+        # A chart touches every coordinate
+        float(projection.coords.sum())
+
+    gc.collect()
+    loaded.wait()
+    usage = memory_usage()
+    results.put({key: usage[key] - baseline[key] for key in usage})
+    release.wait()
+
+
+def measure(mode, data_path, sessions, processes):
+    """Run one mode; return the per-process memory growth dicts."""
+    ctx = multiprocessing.get_context("spawn")
+    loaded, release = ctx.Barrier(processes), ctx.Barrier(processes + 1)
+    results = ctx.Queue()
+    workers = [ctx.Process(target=_worker, args=(mode, data_path, sessions, loaded, release, results))
+               for _ in range(processes)]
+    for worker in workers:
+        worker.start()
+    usage = [results.get() for _ in workers]
+    release.wait()
+    for worker in workers:
+        worker.join()
+    return usage
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare cohort memory per session, per process and mapped.")
+    parser.add_argument("--scale", type=int, default=100_000, help="Synthetic cohort size")
+    parser.add_argument("--sessions", type=int, default=8, help="Simulated sessions per process")
+    parser.add_argument("--processes", type=int, default=2, help="App worker processes")
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        parser.error("needs /proc/self/smaps_rollup (Linux)")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Children inherit the cache location, so every process shares one store.
+        os.environ["MYHEARTRISK_CACHE_DIR"] = os.path.join(workdir, "cache")
+        from benchmarks.synthetic import synthetic_cohort
+        from cohort_store import load_store
+
+        data_path = os.path.join(workdir, "cohort.csv")
+        synthetic_cohort(args.scale, seed=args.seed).to_csv(data_path, index=False)
+        store = load_store(data_path)
+        print(f"{args.scale:,} patients, store maps {store.nbytes / 2**20:.1f} MiB; "
+              f"{args.processes} process(es) x {args.sessions} session(s)", file=sys.stderr)
+
+        rows = {}
+        for mode in args.modes.split(","):
+            usage = measure(mode, data_path, args.sessions, args.processes)
+            rows[mode] = {key: sum(u[key] for u in usage) for key in ("rss", "pss", "uss")}
+            print(f"{mode:<12} growth over baseline: RSS {rows[mode]['rss'] / 2**20:8.1f} MiB  "
+                  f"PSS {rows[mode]['pss'] / 2**20:8.1f} MiB  USS {rows[mode]['uss'] / 2**20:8.1f} MiB",
+                  file=sys.stderr)
+
+    if "store" in rows:
+        for mode in rows:
+            if mode != "store" and rows["store"]["pss"] > 0:
+                print(f"store uses {rows[mode]['pss'] / rows['store']['pss']:.1f}x less PSS than {mode}",
+                      file=sys.stderr)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Replay audit-log submissions as load against the scoring path.
+
+    python -m benchmarks.replay                                  # logs/requests.jsonl (+ rotations)
+    python -m benchmarks.replay logs/requests.jsonl --concurrency 32 --repeat 10
+    python -m benchmarks.replay --target model --scorer numpy
+    python -m benchmarks.replay --url http://localhost:8000      # a running ``uvicorn service:app``
+
+Targets:
+
+* ``service`` (default) - the ASGI app in-process, so concurrent requests go
+  through the micro-batcher exactly as over HTTP;
+* ``model``  - one ``predict_proba`` call per record on a thread pool, as
+  the Streamlit script does.
+
+Reports throughput, latency percentiles, errors and how many replayed
+predictions differ from the logged ones (only records scored by the same
+model version are compared).  Replays are not themselves audited unless
+``--audit`` is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def read_records(paths, limit=None):
+    """Audit records from ``paths`` in order (blank and malformed lines are skipped)."""
+    records = []
+    for path in paths:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if isinstance(record, dict) and isinstance(record.get("inputs"), dict):
+                    records.append(record)
+                    if limit and len(records) >= limit:
+                        return records
+    return records
+
+
+def replay_model(records, concurrency, scorer):
+    """Score each record on a thread pool; return ``(outcomes, model_version, wall_seconds)``.
+
+    ``outcomes`` holds one ``(latency_ms, prediction | exception)`` per record.
+    """
+    from linear_scorer import load_scorer
+    from model_registry import get_registry
+    from schema import input_frame, load_manifest
+
+    registry = get_registry()
+    model = registry.get()
+    manifest = load_manifest()
+    linear = load_scorer(registry.current()) if scorer == "numpy" else None
+
+    def score(record):
+        start = time.perf_counter()
+        try:
+            if linear is not None:
+                proba = linear.predict_proba_dict(record["inputs"])
+            else:
+                proba = model.predict_proba(input_frame(manifest, record["inputs"]))[0]
+            outcome = int(model.classes_[proba.argmax()])
+        except Exception as exc:
+            outcome = exc
+        return (time.perf_counter() - start) * 1000, outcome
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        outcomes = list(pool.map(score, records))
+    return outcomes, registry.current().version, time.perf_counter() - start
+
+
+async def _replay_http(records, concurrency, client):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(record):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await client.post("/predict", json={"patient": record["inputs"]})
+                body = response.json()
+                outcome = body["prediction"] if response.status_code == 200 else RuntimeError(body)
+            except Exception as exc:
+                outcome = exc
+            return (time.perf_counter() - start) * 1000, outcome
+
+    # Warm the model and cohort before the clock starts
+    health = (await client.get("/health")).json()
+    start = time.perf_counter()
+    outcomes = await asyncio.gather(*(send(record) for record in records))
+    return list(outcomes), health.get("model_version"), time.perf_counter() - start
+
+
+def replay_service(records, concurrency, url=None):
+    import httpx
+
+    async def run():
+        if url:
+            client = httpx.AsyncClient(base_url=url, timeout=30)
+        else:
+            from service import app
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://replay")
+        async with client:
+            try:
+                return await _replay_http(records, concurrency, client)
+            finally:
+                if not url:
+                    await app.batcher.close()
+
+    return asyncio.run(run())
+
+
+def summarize(records, outcomes, model_version, wall):
+    from instrumentation import percentiles
+
+    latencies = [ms for ms, _ in outcomes]
+    errors = [o for _, o in outcomes if isinstance(o, Exception)]
+    comparable = [(r, o) for r, (_, o) in zip(records, outcomes)
+                  if not isinstance(o, Exception) and r.get("model_version") == model_version]
+    return {
+        "requests": len(outcomes),
+        "errors": len(errors),
+        "wall_seconds": wall,
+        "throughput_rps": len(outcomes) / wall if wall > 0 else 0.0,
+        "latency_ms": {**percentiles(latencies), "mean": sum(latencies) / len(latencies) if latencies else 0.0},
+        "compared": len(comparable),
+        "mismatches": sum(1 for r, o in comparable if o != r.get("prediction")),
+        "first_error": repr(errors[0]) if errors else None,
+    }
+
+
+def main(argv=None):
+    from audit import rotated_paths
+
+    parser = argparse.ArgumentParser(description="Replay audit-log submissions against the scoring path.")
+    parser.add_argument("paths", nargs="*", help="Audit JSONL files (default: logs/requests.jsonl and rotations)")
+    parser.add_argument("--target", choices=("service", "model"), default="service")
+    parser.add_argument("--url", help="Replay over HTTP against a running service instead")
+    parser.add_argument("--scorer", choices=("sklearn", "numpy"), default="sklearn", help="For --target model")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=1, help="Replay the records this many times")
+    parser.add_argument("--limit", type=int, help="Use at most this many records")
+    parser.add_argument("--audit", action="store_true", help="Also audit the replayed predictions")
+    parser.add_argument("--output", help="Write the summary as JSON")
+    args = parser.parse_args(argv)
+
+    if not args.audit:
+        os.environ["MYHEARTRISK_AUDIT"] = "0"
+    paths = args.paths or rotated_paths()
+    records = read_records(paths, args.limit)
+    if not records:
+        parser.error(f"no audit records in {', '.join(paths) or 'logs/requests.jsonl'}")
+    records = records * args.repeat
+
+    if args.url or args.target == "service":
+        outcomes, model_version, wall = replay_service(records, args.concurrency, args.url)
+    else:
+        outcomes, model_version, wall = replay_model(records, args.concurrency, args.scorer)
+    summary = summarize(records, outcomes, model_version, wall)
+    summary.update(target=args.url or args.target, concurrency=args.concurrency, model_version=model_version)
+
+    latency = summary["latency_ms"]
+    print(f"{summary['requests']:,} requests in {summary['wall_seconds']:.2f}s "
+          f"({summary['throughput_rps']:.1f} req/s, concurrency {args.concurrency}, {summary['target']})",
+          file=sys.stderr)
+    print(f"latency ms  p50 {latency.get('p50', 0):.2f}  p95 {latency.get('p95', 0):.2f}  "
+          f"p99 {latency.get('p99', 0):.2f}  mean {latency['mean']:.2f}", file=sys.stderr)
+    print(f"errors {summary['errors']}  mismatches {summary['mismatches']}/{summary['compared']}", file=sys.stderr)
+    if summary["first_error"]:
+        print(f"first error: {summary['first_error']}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(summary, fh, indent=2)
+    return summary
+
+
+if __name__ == "__main__":
+    main()
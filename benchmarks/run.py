@@ -0,0 +1,279 @@
+"""Reproducible benchmarks of the app's hot paths at several cohort sizes.
+
+    python -m benchmarks.run --scales 120,10000,1000000
+    python -m benchmarks.compare benchmarks/results/<old>.json benchmarks/results/<new>.json
+
+Each benchmark is timed on a synthetic cohort of every requested size
+(fixed seed) and the median/min wall time is written, together with the git
+commit and platform, to ``benchmarks/results/<commit>.json``.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import cohort as cohort_module
+import cohort_store
+from benchmarks.synthetic import synthetic_cohort
+from model_registry import get_registry
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+DEFAULT_SCALES = (120, 1_000, 10_000, 100_000)
+
+BENCHMARKS = {}
+
+
+def benchmark(name, max_scale=None):
+    """Register ``setup(frame, workdir) -> callable`` as benchmark ``name``."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, max_scale)
+        return setup
+    return register
+
+
+# -----------------------
+# Benchmarks
+# -----------------------
+@benchmark("dataset_load_excel", max_scale=20_000)
+def _dataset_load_excel(frame, workdir):
+    path = os.path.join(workdir, "cohort.xlsx")
+    frame.to_excel(path, index=False)
+    return lambda: _cold_load(path, workdir)
+
+
+@benchmark("dataset_load_csv")
+def _dataset_load_csv(frame, workdir):
+    path = os.path.join(workdir, "cohort.csv")
+    frame.to_csv(path, index=False)
+    return lambda: _cold_load(path, workdir)
+
+
+@benchmark("dataset_load_parquet")
+def _dataset_load_parquet(frame, workdir):
+    path = os.path.join(workdir, "cohort.parquet")
+    frame.to_parquet(path, index=False)
+    return lambda: _cold_load(path, workdir)
+
+
+@benchmark("dataset_load_sqlite")
+def _dataset_load_sqlite(frame, workdir):
+    import sqlite3
+
+    path = os.path.join(workdir, "cohort.sqlite")
+    with sqlite3.connect(path) as connection:
+        frame.astype({col: object for col in frame.select_dtypes("category")}).to_sql(
+            "cohort", connection, index=False, if_exists="replace")
+    connection.close()
+    return lambda: _cold_load(path, workdir)
+
+
+@benchmark("dataset_load_snapshot")
+def _dataset_load_snapshot(frame, workdir):
+    path = os.path.join(workdir, "cohort.csv")
+    frame.to_csv(path, index=False)
+    _cold_load(path, workdir)
+
+    def run():
+        cohort_module._cohorts.clear()
+        return cohort_module.load_cohort(path)
+    return run
+
+
+def _cold_load(path, workdir):
+    cohort_module._cohorts.clear()
+    cache = os.path.join(workdir, "cache")
+    if os.path.isdir(cache):
+        for root, _, files in os.walk(cache):
+            for name in files:
+                os.remove(os.path.join(root, name))
+    cohort_module.CACHE_DIR = cache
+    return cohort_module.load_cohort(path)
+
+
+@benchmark("single_predict")
+def _single_predict(frame, workdir):
+    model = get_registry().get()
+    row = frame.drop(columns="Target").iloc[[0]]
+    return lambda: model.predict_proba(row)
+
+
+@benchmark("batch_predict")
+def _batch_predict(frame, workdir):
+    model = get_registry().get()
+    rows = frame.drop(columns="Target")
+    return lambda: model.predict_proba(rows)
+
+
+@benchmark("projection_fit")
+def _projection_fit(frame, workdir):
+    from projection import Projection
+    return lambda: Projection.fit(frame)
+
+
+@benchmark("projection_transform")
+def _projection_transform(frame, workdir):
+    from projection import Projection
+    projection = Projection.fit(frame)
+    row = frame.drop(columns="Target").iloc[[0]]
+    return lambda: projection.transform(row)
+
+
+@benchmark("similarity_build")
+def _similarity_build(frame, workdir):
+    from similarity import SimilarityIndex
+    return lambda: SimilarityIndex.fit(frame)
+
+
+@benchmark("similarity_query")
+def _similarity_query(frame, workdir):
+    from similarity import SimilarityIndex
+    index = SimilarityIndex.fit(frame)
+    row = frame.drop(columns="Target").iloc[[0]]
+    return lambda: index.top_k(row, k=10)
+
+
+@benchmark("report_render")
+def _report_render(frame, workdir):
+    import plotly.graph_objects as go
+    from charts import build_background, pca_figure, user_trace
+    from projection import Projection
+
+    projection = Projection.fit(frame)
+    background = build_background(projection.coords, projection.target)
+    user_point = projection.transform(frame.drop(columns="Target").iloc[[0]])
+
+    # What st.plotly_chart does per report: overlay, validate and serialise.
+    return lambda: go.Figure(pca_figure(background, user_trace(user_point))).to_json()
+
+
+@benchmark("cube_build")
+def _cube_build(frame, workdir):
+    from cohort_cube import CountCube
+    return lambda: CountCube.from_frame(frame)
+
+
+@benchmark("cube_query")
+def _cube_query(frame, workdir):
+    from cohort_cube import CountCube
+    cube = CountCube.from_frame(frame)
+    feature, (where, levels) = cube.features[0], (cube.features[-1], cube.levels[-1])
+    return lambda: cube.level_counts(feature, slice(1, 4), (where, levels[0]))
+
+
+@benchmark("store_ingest")
+def _store_ingest(frame, workdir):
+    path = _store_source(frame, workdir)
+    batch = frame.sample(100, replace=len(frame) < 100, random_state=0)
+    return lambda: cohort_store.ingest(batch, path)
+
+
+@benchmark("store_compact")
+def _store_compact(frame, workdir):
+    path = _store_source(frame, workdir)
+    cohort_store.ingest(frame.sample(100, replace=len(frame) < 100, random_state=0), path)
+    return lambda: cohort_store.compact(path)
+
+
+def _store_source(frame, workdir):
+    """Build a cohort store for ``frame`` under ``workdir``; return the source path."""
+    path = os.path.join(workdir, "cohort.csv")
+    frame.to_csv(path, index=False)
+    cohort_module.CACHE_DIR = cohort_store.CACHE_DIR = os.path.join(workdir, "cache")
+    cohort_store.load_store(path)
+    return path
+
+
+# -----------------------
+# Harness
+# -----------------------
+def time_callable(fn, repeats, budget):
+    """Call ``fn`` up to ``repeats`` times (at least once, within ``budget`` seconds)."""
+    samples = []
+    deadline = time.perf_counter() + budget
+    while len(samples) < repeats and (not samples or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def run(scales, names, repeats, budget, seed):
+    results = []
+    for scale in scales:
+        frame = synthetic_cohort(scale, seed=seed)
+        for name in names:
+            setup, max_scale = BENCHMARKS[name]
+            if max_scale is not None and scale > max_scale:
+                continue
+            with tempfile.TemporaryDirectory() as workdir:
+                saved_cache = cohort_module.CACHE_DIR
+                try:
+                    samples = time_callable(setup(frame, workdir), repeats, budget)
+                finally:
+                    cohort_module.CACHE_DIR = cohort_store.CACHE_DIR = saved_cache
+                    cohort_module._cohorts.clear()
+                    cohort_store._stores.clear()
+            result = {
+                "benchmark": name,
+                "scale": scale,
+                "median_ms": float(np.median(samples)),
+                "min_ms": float(np.min(samples)),
+                "repeats": len(samples),
+            }
+            results.append(result)
+            print(f"{name:<24} {scale:>9,} rows  median {result['median_ms']:10.3f} ms  "
+                  f"min {result['min_ms']:10.3f} ms  (n={len(samples)})", file=sys.stderr)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark MyHeartRisk hot paths on synthetic cohorts.")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="Comma-separated cohort sizes (e.g. 120,1000,1000000)")
+    parser.add_argument("--only", default="", help="Comma-separated benchmark names (default: all)")
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--budget", type=float, default=10.0, help="Seconds per benchmark and scale")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<commit>.json)")
+    args = parser.parse_args(argv)
+
+    names = [n for n in args.only.split(",") if n] or list(BENCHMARKS)
+    unknown = sorted(set(names) - set(BENCHMARKS))
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    scales = [int(s) for s in args.scales.split(",")]
+
+    commit = git_commit()
+    results = run(scales, names, args.repeats, args.budget, args.seed)
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as fh:
+        json.dump({
+            "commit": commit,
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "results": results,
+        }, fh, indent=2)
+    print(f"Wrote {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
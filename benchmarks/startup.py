@@ -0,0 +1,164 @@
+"""Cold-start benchmark of the Streamlit app.
+
+    python -m benchmarks.startup                    # this checkout
+    python -m benchmarks.startup --compare HEAD~1   # ... and an older commit, side by side
+
+Each measurement runs in fresh interpreters (``--runs`` of them, median
+reported), drives ``app.py`` with Streamlit's ``AppTest`` and records:
+
+* ``app_imports_s``  - time spent importing modules during the first script
+  run (from ``python -X importtime``, Streamlit itself excluded);
+* ``first_paint_s``  - the first landing-page run in a cold process;
+* ``new_session_s``  - the landing page for a second session in the same,
+  already warm, process;
+* ``first_report_s`` - the first "Analyze Risk" run after the page is up
+  (and after the background warm-up, when the app has one);
+* ``heavy_modules``  - which heavy libraries the landing page had loaded
+  (before handing over to the warm-up thread).
+
+``--compare REV`` exports ``REV`` with ``git archive`` into a temporary
+directory (reusing this checkout's ``.cache``) and measures it the same way.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ("pandas", "sklearn", "plotly.graph_objects", "pyarrow", "joblib", "matplotlib")
+MARK_START = "--- app run start ---"
+MARK_END = "--- app run end ---"
+
+# Executed in a fresh interpreter with the app directory as cwd.
+DRIVER = r'''
+import json, os, sys, time
+sys.path.insert(0, os.getcwd())
+from streamlit.testing.v1 import AppTest
+
+HEAVY = %(heavy)r
+result = {}
+preloaded = set(sys.modules)  # e.g. AppTest itself imports Plotly
+
+
+def landing_modules():
+    return [m for m in HEAVY if m in sys.modules and m not in preloaded]
+
+
+try:
+    # Snapshot the modules just before the app hands over to its warm-up thread
+    import warmup
+    start_warmup = warmup.start_warmup
+
+    def snapshot_then_start(*args):
+        result.setdefault("heavy_modules", landing_modules())
+        start_warmup(*args)
+    warmup.start_warmup = snapshot_then_start
+except ImportError:
+    warmup = None
+
+sys.stderr.write(%(start)r + "\n"); sys.stderr.flush()
+at = AppTest.from_file("app.py", default_timeout=300)
+t = time.perf_counter()
+at.run()
+result["first_paint_s"] = time.perf_counter() - t
+sys.stderr.write(%(end)r + "\n"); sys.stderr.flush()
+result.setdefault("heavy_modules", landing_modules())
+result["exception"] = [str(e.value) for e in at.exception]
+
+t = time.perf_counter()
+AppTest.from_file("app.py", default_timeout=300).run()
+result["new_session_s"] = time.perf_counter() - t
+
+if warmup is not None:
+    t = time.perf_counter()
+    warmup.wait(timeout=300)
+    result["warmup_wait_s"] = time.perf_counter() - t
+
+at.sidebar.button[0].click()
+t = time.perf_counter()
+at.run()
+result["first_report_s"] = time.perf_counter() - t
+print(json.dumps(result))
+'''
+
+
+def _import_seconds(stderr):
+    """Sum of ``-X importtime`` self times between the run markers."""
+    total, inside = 0, False
+    for line in stderr.splitlines():
+        if line == MARK_START:
+            inside = True
+        elif line == MARK_END:
+            break
+        elif inside and line.startswith("import time:"):
+            fields = line.split("|")
+            try:
+                total += int(fields[0].split(":")[1])
+            except ValueError:
+                continue  # the header line
+    return total / 1e6
+
+
+def measure_once(app_dir):
+    driver = DRIVER % {"heavy": HEAVY, "start": MARK_START, "end": MARK_END}
+    env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    env.setdefault("MYHEARTRISK_CACHE_DIR", os.path.join(ROOT, ".cache"))
+    env.setdefault("MYHEARTRISK_AUDIT", "0")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", driver], cwd=app_dir, env=env,
+                          capture_output=True, text=True, check=False)
+    if proc.returncode != 0:
+        raise RuntimeError(f"startup driver failed in {app_dir}:\n{proc.stderr[-2000:]}")
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["app_imports_s"] = _import_seconds(proc.stderr)
+    return result
+
+
+def measure(app_dir, runs):
+    samples = [measure_once(app_dir) for _ in range(runs)]
+    summary = {key: statistics.median(s[key] for s in samples)
+               for key in samples[0] if isinstance(samples[0][key], float)}
+    summary["heavy_modules"] = samples[-1]["heavy_modules"]
+    summary["exception"] = samples[-1]["exception"]
+    return summary
+
+
+def export_revision(rev, directory):
+    archive = subprocess.run(["git", "archive", rev], cwd=ROOT, capture_output=True, check=True).stdout
+    subprocess.run(["tar", "-x", "-C", directory], input=archive, check=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure app import time and time-to-first-paint.")
+    parser.add_argument("--compare", metavar="REV", help="Also measure this git revision")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh processes per measurement")
+    parser.add_argument("--output", help="Write the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {"current": measure(ROOT, args.runs)}
+    if args.compare:
+        with tempfile.TemporaryDirectory() as workdir:
+            export_revision(args.compare, workdir)
+            results[args.compare] = measure(workdir, args.runs)
+
+    keys = ("app_imports_s", "first_paint_s", "new_session_s", "warmup_wait_s", "first_report_s")
+    print(f"{'':<16}" + "".join(f"{name:>16}" for name in results), file=sys.stderr)
+    for key in keys:
+        print(f"{key:<16}" + "".join(f"{r[key]:>16.3f}" if key in r else f"{'-':>16}" for r in results.values()),
+              file=sys.stderr)
+    for name, r in results.items():
+        print(f"{name}: landing page loaded {', '.join(r['heavy_modules']) or 'no heavy modules'}",
+              file=sys.stderr)
+    for name, r in results.items():
+        if r["exception"]:
+            print(f"{name}: app raised {r['exception']}", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(results, fh, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Synthetic cohorts that preserve the schema of ``Data_health1.xlsx``.
+
+Target balance, the categorical levels and their per-class frequencies, and
+the per-class Age distribution (clipped to the observed range) are taken from
+the reference cohort, so a synthetic row looks like a real one to every code
+path in the app.
+"""
+import numpy as np
+import pandas as pd
+
+from cohort import TARGET, load_cohort
+
+
+def synthetic_cohort(n, reference=None, seed=0):
+    """Return a DataFrame of ``n`` synthetic patients with the reference schema."""
+    reference = load_cohort().frame if reference is None else reference
+    rng = np.random.default_rng(seed)
+
+    classes, counts = np.unique(reference[TARGET].to_numpy(), return_counts=True)
+    target = rng.choice(classes, size=n, p=counts / counts.sum())
+
+    columns = {}
+    for col in reference.columns.drop(TARGET):
+        values = reference[col]
+        out = np.empty(n, dtype=float if pd.api.types.is_numeric_dtype(values) else object)
+        for cls in classes:
+            mask = target == cls
+            observed = values[reference[TARGET] == cls].dropna()
+            if pd.api.types.is_numeric_dtype(values):
+                draws = rng.normal(observed.mean(), observed.std(ddof=0) or 1.0, mask.sum())
+                out[mask] = np.clip(np.round(draws), values.min(), values.max())
+            else:
+                levels, freq = np.unique(observed.to_numpy(), return_counts=True)
+                out[mask] = rng.choice(levels, size=mask.sum(), p=freq / freq.sum())
+        columns[col] = out
+
+    frame = pd.DataFrame(columns)
+    frame[TARGET] = target.astype(reference[TARGET].dtype)
+    return frame.astype(reference.dtypes.to_dict())
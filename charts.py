@@ -0,0 +1,83 @@
+"""Interactive Plotly PCA chart for the Report Dashboard.
+
+The cohort background (Controls/Cases) depends only on the cohort, so it is
+built once per cohort version and kept as a serialised figure; each report
+only overlays the user's marker.  Up to ``MAX_POINTS`` patients are drawn as
+individual WebGL markers; larger cohorts are drawn as a fixed grid of binned
+markers sized by count, so the payload sent to the browser stays flat as the
+cohort grows.
+"""
+import os
+import threading
+
+import numpy as np
+import plotly.graph_objects as go
+
+MAX_POINTS = int(os.environ.get("MYHEARTRISK_CHART_MAX_POINTS", 5000))
+GRID = 60
+GROUPS = ((0, "Controls", "blue"), (1, "Cases", "red"))
+
+_lock = threading.Lock()
+_backgrounds = {}
+
+
+def _binned(coords, bounds):
+    """Bin ``coords`` on a GRID x GRID lattice; return centre x, centre y and counts."""
+    (x0, x1), (y0, y1) = bounds
+    counts, xedges, yedges = np.histogram2d(coords[:, 0], coords[:, 1], bins=GRID, range=[[x0, x1], [y0, y1]])
+    ix, iy = np.nonzero(counts)
+    xc = (xedges[ix] + xedges[ix + 1]) / 2
+    yc = (yedges[iy] + yedges[iy + 1]) / 2
+    return xc, yc, counts[ix, iy]
+
+
+def build_background(coords, target):
+    """Return the cohort-only PCA figure as a plain Plotly dict."""
+    fig = go.Figure()
+    binned = len(coords) > MAX_POINTS
+    bounds = [(coords[:, 0].min(), coords[:, 0].max()), (coords[:, 1].min(), coords[:, 1].max())]
+    for label, name, color in GROUPS:
+        group = coords[target == label]
+        if binned:
+            x, y, counts = _binned(group, bounds)
+            fig.add_trace(go.Scattergl(
+                x=x, y=y, mode="markers", name=name,
+                marker=dict(color=color, opacity=0.6, size=4 + 14 * np.sqrt(counts / counts.max())),
+                customdata=counts, hovertemplate=f"{name}: %{{customdata:.0f}} patients<extra></extra>",
+            ))
+        else:
+            fig.add_trace(go.Scattergl(
+                x=group[:, 0], y=group[:, 1], mode="markers", name=name,
+                marker=dict(color=color, opacity=0.6, size=8),
+                hovertemplate=f"{name}<br>PCA 1: %{{x:.2f}}<br>PCA 2: %{{y:.2f}}<extra></extra>",
+            ))
+    fig.update_layout(
+        title="PCA Projection", xaxis_title="PCA 1", yaxis_title="PCA 2",
+        width=800, height=600, legend=dict(itemsizing="constant"),
+    )
+    return fig.to_plotly_json()
+
+
+def load_background(version, projection):
+    """Return the cached background figure of ``projection`` (a store's ``fit_version``)."""
+    background = _backgrounds.get(version)
+    if background is None:
+        with _lock:
+            background = _backgrounds.get(version)
+            if background is None:
+                background = _backgrounds[version] = build_background(projection.coords, projection.target)
+    return background
+
+
+def user_trace(user_point):
+    """The per-request overlay: the user's marker."""
+    return go.Scatter(
+        x=user_point[:, 0], y=user_point[:, 1], mode="markers", name="You",
+        marker=dict(color="gold", size=16, symbol="triangle-down", line=dict(color="black", width=1)),
+        hovertemplate="You<br>PCA 1: %{x:.2f}<br>PCA 2: %{y:.2f}<extra></extra>",
+    ).to_plotly_json()
+
+
+def pca_figure(background, overlay):
+    """Combine the cached background with a user overlay into a figure dict."""
+    return {"data": background["data"] + [overlay], "layout": background["layout"]}
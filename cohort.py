@@ -0,0 +1,148 @@
+"""Cached access to the reference cohort.
+
+Parsing ``Data_health1.xlsx`` with openpyxl is the most expensive thing the app
+does per interaction, so the workbook is converted once into a Parquet snapshot
+keyed by the file's content hash and the resulting frame is kept in memory for
+the life of the process.  Editing the workbook changes its hash, which
+invalidates both the in-memory copy and the snapshot.  CSV, Parquet and SQLite
+sources work the same way (see :mod:`cohort_sources`).
+"""
+import contextlib
+import logging
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+
+import pandas as pd
+
+from storage import CACHE_DIR, file_hash
+
+mainpath = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DATA_PATH = os.path.join(mainpath, r'Data_health1.xlsx')
+logger = logging.getLogger(__name__)
+TARGET = "Target"
+# Bump when _read_source changes so stale snapshots are not reused.
+SNAPSHOT_FORMAT = 3
+
+_lock = threading.Lock()
+_cohorts = {}
+_versions = {}
+
+
+@dataclass(frozen=True)
+class Cohort:
+    """The reference cohort frame plus the hash of the file it came from."""
+    path: str
+    version: str
+    frame: pd.DataFrame
+
+    @property
+    def features(self):
+        """Feature columns in model order (every column except ``Target``)."""
+        return self.frame.columns.drop(TARGET)
+
+    @property
+    def target(self):
+        return self.frame[TARGET]
+
+
+def cohort_version(path=DEFAULT_DATA_PATH):
+    """Content hash of ``path`` without parsing it; re-hashed only when its stat changes."""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _versions.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    version = file_hash(path)
+    _versions[path] = (stamp, version)
+    return version
+
+
+def snapshot_path(path, version):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, "cohort", f"{stem}-{version[:16]}-v{SNAPSHOT_FORMAT}.parquet")
+
+
+def _read_source(path):
+    """Stream, validate and compact ``path`` (see :mod:`cohort_sources`)."""
+    from cohort_sources import load_source
+    from schema import DEFAULT_SCHEMA_PATH, load_manifest
+
+    frame, stats = load_source(path, manifest=load_manifest(DEFAULT_SCHEMA_PATH))
+    logger.info("loaded %(rows)s patients from %(source)s (%(format)s, %(chunks)s chunks) in %(seconds).2fs", stats)
+    return frame
+
+
+def normalize_categories(frame):
+    """Cast every non-null value of the object columns of ``frame`` to str, in place.
+
+    Excel hands back mixed int/str cells (e.g. a bare 0 next to '1–20') which
+    Parquet cannot store, and the model was trained on string-cast categories.
+    """
+    for col in frame.select_dtypes(include="object").columns:
+        values = frame[col]
+        frame[col] = values.astype(str).where(values.notna(), None)
+    return frame
+
+
+def _load_snapshot(path, version):
+    snap = snapshot_path(path, version)
+    if os.path.exists(snap):
+        return pd.read_parquet(snap)
+
+    frame = _read_source(path)
+    os.makedirs(os.path.dirname(snap), exist_ok=True)
+    # Write to a unique temporary name first so a concurrent reader never sees
+    # a half-written snapshot and concurrent writers do not clobber each other.
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(snap), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            frame.to_parquet(fh, index=False)
+        os.replace(tmp, snap)
+    except BaseException:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(tmp)
+        raise
+    return frame
+
+
+def read_cohort(path=DEFAULT_DATA_PATH):
+    """The cohort frame for ``path`` (from its snapshot) without keeping it in this process.
+
+    For one-off builds whose results are cached elsewhere (the cohort store,
+    the count cube, the attribution baseline).  Serialised with
+    :func:`load_cohort` so a cold snapshot is built once.
+    """
+    path = os.path.abspath(path)
+    with _lock:
+        return _load_snapshot(path, cohort_version(path))
+
+
+def load_cohort(path=DEFAULT_DATA_PATH):
+    """Return the :class:`Cohort` for ``path``, parsing it at most once.
+
+    The file is only re-hashed when its size or modification time changes, so
+    a warm call costs a single ``os.stat``.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+
+    cached = _cohorts.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    with _lock:
+        cached = _cohorts.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        version = file_hash(path)
+        if cached is not None and cached[1].version == version:
+            # Touched but not modified: keep the existing frame.
+            cohort = cached[1]
+        else:
+            cohort = Cohort(path=path, version=version, frame=_load_snapshot(path, version))
+        _cohorts[path] = (stamp, cohort)
+        return cohort
@@ -0,0 +1,233 @@
+"""Precomputed count cube for interactive cohort views.
+
+The Feature Analysis tab shows how common each level of a categorical
+feature is among cases and controls, for a range of age bands and optionally
+only among patients with a given level of another feature.  Rather than
+grouping the cohort frame on every widget change, the cohort is counted once
+into a dense cube::
+
+    counts[level_i, level_j, target, age_band]
+
+over all categorical levels (``level_i == level_j`` on the diagonal holds
+the single-level counts).  Every view is then a slice and a sum over a
+few hundred kilobytes, independent of the number of patients.  Only one
+filter feature is supported; combinations of filters would need
+higher-order cubes.
+
+The cube is additive, so it is built per part - the source cohort file and
+each batch ingested into the :mod:`cohort_store` - cached under
+``.cache/cube`` and summed; an ingest only counts the new batch::
+
+    python cohort_cube.py            # build and print the cube for Data_health1.xlsx
+"""
+import json
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from cohort import CACHE_DIR, DEFAULT_DATA_PATH, TARGET, read_cohort
+
+# Bump when the cube layout or AGE_EDGES change so stale caches are not reused.
+CUBE_FORMAT = 1
+AGE_COL = "Age"
+AGE_EDGES = (30, 40, 50, 60, 70)
+UNKNOWN_AGE = "Unknown"
+TARGETS = (1, 0)  # cases, controls
+
+_lock = threading.Lock()
+_cubes = {}
+
+
+def age_bands(edges=AGE_EDGES):
+    """Band labels for ``edges``: ``<30``, ``30–39``, ..., ``70+``, then ``Unknown``."""
+    labels = [f"<{edges[0]}"]
+    labels += [f"{low}–{high - 1}" for low, high in zip(edges, edges[1:])]
+    labels += [f"{edges[-1]}+", UNKNOWN_AGE]
+    return labels
+
+
+def band_codes(age, edges=AGE_EDGES):
+    """Band index per age (missing ages go to the last, ``Unknown`` band)."""
+    age = pd.to_numeric(age, errors="coerce").to_numpy(dtype=np.float64)
+    codes = np.searchsorted(np.asarray(edges, dtype=np.float64), age, side="right")
+    codes[np.isnan(age)] = len(edges) + 1
+    return codes
+
+
+def level_space(frame):
+    """``(features, levels)``: the categorical columns of ``frame`` and their sorted levels."""
+    features = [c for c in frame.select_dtypes(include=["object", "category"]).columns if c not in (TARGET, AGE_COL)]
+    levels = [sorted(str(v) for v in pd.unique(frame[c]) if not pd.isna(v)) for c in features]
+    return features, levels
+
+
+class CountCube:
+    """Pairwise level counts by target and age band, plus the per-band totals."""
+
+    def __init__(self, features, levels, counts, totals):
+        self.features = list(features)
+        self.levels = [list(lv) for lv in levels]
+        self.offsets = np.cumsum([0] + [len(lv) for lv in self.levels])
+        self.counts = counts
+        self.totals = totals
+        self.bands = age_bands()
+
+    @classmethod
+    def from_frame(cls, frame, features=None, levels=None):
+        """Count ``frame`` into a cube (``features``/``levels`` default to the frame's own).
+
+        Values outside ``levels`` and rows without a 0/1 target are not counted.
+        """
+        if features is None:
+            features, levels = level_space(frame)
+        n_levels = sum(len(lv) for lv in levels)
+        n_bands = len(AGE_EDGES) + 2
+        cells = 2 * n_bands
+        target = pd.to_numeric(frame[TARGET], errors="coerce").to_numpy()
+        keep = np.isin(target, (0, 1))
+        # target/band cell of each row, and its global level index per feature;
+        # missing or unknown values count under a dummy last level, dropped below
+        cell = target[keep].astype(np.intp) * n_bands + band_codes(frame[AGE_COL])[keep]
+        width = n_levels + 1
+        offset, codes = 0, []
+        for feature, feature_levels in zip(features, levels):
+            # factorize once, then map the few distinct values (missing -> -1 -> dummy)
+            raw, uniques = pd.factorize(frame[feature].to_numpy()[keep])
+            position = {level: offset + k for k, level in enumerate(feature_levels)}
+            lookup = np.array([position.get(str(u), n_levels) for u in uniques] + [n_levels], dtype=np.intp)
+            codes.append(lookup[raw])
+            offset += len(feature_levels)
+
+        # key = (left * width + right) * cells + cell, split into a left and a right part
+        left_parts = [code * (width * cells) for code in codes]
+        right_parts = [code * cells + cell for code in codes]
+        size = width * width * cells
+        diagonal = np.zeros(size, dtype=np.int64)
+        upper = np.zeros(size, dtype=np.int64)
+        for i, left in enumerate(left_parts):
+            diagonal += np.bincount(left + right_parts[i], minlength=size)
+            for right in right_parts[i + 1:]:
+                upper += np.bincount(left + right, minlength=size)
+        upper = upper.reshape(width, width, 2, n_bands)
+        # pairs of different features are symmetric: count each once, mirror it
+        counts = diagonal.reshape(width, width, 2, n_bands) + upper + upper.transpose(1, 0, 2, 3)
+        counts = np.ascontiguousarray(counts[:n_levels, :n_levels])
+        totals = np.bincount(cell, minlength=cells).reshape(2, n_bands)
+        return cls(features, levels, counts, totals)
+
+    def __add__(self, other):
+        if self.features != other.features or self.levels != other.levels:
+            raise ValueError("Cannot add count cubes over different levels")
+        return CountCube(self.features, self.levels, self.counts + other.counts, self.totals + other.totals)
+
+    @property
+    def nbytes(self):
+        return self.counts.nbytes + self.totals.nbytes
+
+    def _level_slice(self, feature):
+        i = self.features.index(feature)
+        return slice(self.offsets[i], self.offsets[i + 1])
+
+    def _level_index(self, feature, level):
+        i = self.features.index(feature)
+        return self.offsets[i] + self.levels[i].index(str(level))
+
+    def level_counts(self, feature, bands=slice(None), where=None):
+        """Patients per level of ``feature`` as ``(levels, [cases, controls])``.
+
+        ``bands`` selects age bands (a slice or index array); ``where`` is an
+        optional ``(feature, level)`` the patients must have.
+        """
+        levels = self._level_slice(feature)
+        if where is None:
+            idx = np.arange(levels.start, levels.stop)
+            block = self.counts[idx, idx]
+        else:
+            block = self.counts[levels, self._level_index(*where)]
+        return block[:, TARGETS, :][:, :, bands].sum(axis=-1)
+
+    def group_totals(self, bands=slice(None), where=None):
+        """``[cases, controls]`` in the selection (the denominators of :meth:`prevalence`)."""
+        if where is None:
+            return self.totals[TARGETS, :][:, bands].sum(axis=-1)
+        j = self._level_index(*where)
+        return self.counts[j, j][TARGETS, :][:, bands].sum(axis=-1)
+
+    def prevalence(self, feature, bands=slice(None), where=None):
+        """Share of cases and of controls with each level of ``feature``, in percent."""
+        counts = self.level_counts(feature, bands, where)
+        totals = self.group_totals(bands, where)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            percent = np.where(totals > 0, counts * 100.0 / totals, np.nan)
+        return pd.DataFrame({
+            "Level": self.levels[self.features.index(feature)],
+            "Cases (%)": percent[:, 0].round(1),
+            "Controls (%)": percent[:, 1].round(1),
+            "Cases": counts[:, 0],
+            "Controls": counts[:, 1],
+        })
+
+    # -----------------------
+    # Persistence
+    # -----------------------
+    def save(self, path):
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, counts=self.counts, totals=self.totals,
+                 space=np.array([json.dumps({"features": self.features, "levels": self.levels})]))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            space = json.loads(str(data["space"][0]))
+            return cls(space["features"], space["levels"], data["counts"], data["totals"])
+
+
+def _cube_path(key):
+    return os.path.join(CACHE_DIR, "cube", f"{key}-v{CUBE_FORMAT}.npz")
+
+
+def _cached_part(key, frame, space=None):
+    """The cube of one part (``frame`` is only called on a cache miss)."""
+    path = _cube_path(key)
+    if os.path.exists(path):
+        return CountCube.load(path)
+    cube = CountCube.from_frame(frame(), *(space or (None, None)))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    cube.save(path)
+    return cube
+
+
+def load_cube(data_path=DEFAULT_DATA_PATH):
+    """The :class:`CountCube` of the cohort store for ``data_path`` (source file plus ingested batches).
+
+    Built once per store version; the source file and each batch are counted
+    once per host.
+    """
+    from cohort_store import load_store
+
+    store = load_store(data_path)
+    cube = _cubes.get(store.version)
+    if cube is None:
+        with _lock:
+            cube = _cubes.get(store.version)
+            if cube is None:
+                cube = _cached_part(store.base_version[:16], lambda: read_cohort(data_path))
+                space = (cube.features, cube.levels)
+                for name, digest in zip(store.state["batches"], store.state["digests"]):
+                    batch = os.path.join(store.root, "batches", name)
+                    # A batch's counts depend on the levels it is counted against
+                    cube = cube + _cached_part(f"{store.base_version[:16]}-{digest[:16]}",
+                                               lambda: pd.read_parquet(batch), space)
+                _cubes[store.version] = cube
+    return cube
+
+
+if __name__ == "__main__":
+    cube = load_cube(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DATA_PATH)
+    print(f"{len(cube.features)} features, {cube.offsets[-1]} levels, {len(cube.bands)} age bands: "
+          f"{cube.nbytes:,} bytes, {int(cube.totals.sum()):,} patients")
+    print(cube.prevalence(cube.features[0]).to_string(index=False))
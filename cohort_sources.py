@@ -0,0 +1,279 @@
+"""Chunked, validated loading of cohort sources.
+
+Partner hospitals send the reference cohort as an Excel workbook, a CSV
+export, a Parquet drop or a SQLite extract; :func:`load_source` reads any of
+them behind the same ``data_path`` (the format is taken from the suffix).
+Every source is streamed in chunks of ``chunksize`` rows and each chunk is
+
+* validated against the schema manifest - ``Target`` plus every sidebar
+  feature must be present and nothing else, numeric features must be
+  numeric and ``Target`` must be 0 or 1 (unlabelled rows, e.g. the
+  workbook's blank separator row, are dropped);
+* compacted straight away - categorical features become ``category``
+  columns (one small integer code per row), numeric features and ``Target``
+  the smallest integer type that holds the chunk (``Age`` fits ``int8``),
+  re-checked against the combined range once every chunk is read;
+
+so peak memory is about one raw chunk plus the compact frame, instead of the
+whole raw sheet.  :mod:`cohort` writes the result to its Parquet snapshot, the
+app's cached columnar copy.  Without a manifest (``python schema.py``, which
+builds ``schema.json`` from the source) the columns are taken from the source
+and the dtypes of its first chunk decide which features are numeric.
+
+Reading a workbook still means unzipping its XML, so Excel remains the slowest
+source; convert large ones to CSV or Parquet.  SQLite sources are read from
+their only table, or from the table named ``cohort``::
+
+    python cohort_sources.py Data_health1.xlsx partner.csv extract.sqlite   # load time per source
+    python cohort_sources.py partner.csv --memory                           # + peak memory
+    python cohort_sources.py new_export.csv --infer                        # without schema.json
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from cohort import TARGET
+from schema import DEFAULT_SCHEMA_PATH, NUMERIC, load_manifest
+
+DEFAULT_CHUNKSIZE = 50_000
+SQLITE_TABLE = "cohort"
+
+
+# -----------------------
+# Readers
+# -----------------------
+def _iter_csv(path, chunksize, categorical):
+    yield from pd.read_csv(path, chunksize=chunksize, dtype={col: str for col in categorical})
+
+
+def _iter_parquet(path, chunksize, categorical):
+    import pyarrow.parquet as pq
+
+    source = pq.ParquetFile(path, read_dictionary=[c for c in categorical if c in pq.read_schema(path).names])
+    for batch in source.iter_batches(batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+def _iter_excel(path, chunksize, categorical):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(h) for h in next(rows)]
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunksize:
+                yield pd.DataFrame(chunk, columns=header)
+                chunk = []
+        if chunk:
+            yield pd.DataFrame(chunk, columns=header)
+    finally:
+        workbook.close()
+
+
+def sqlite_table(connection):
+    """The table holding the cohort: the only table, or the one named ``cohort``."""
+    tables = [row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+    if len(tables) == 1:
+        return tables[0]
+    if SQLITE_TABLE in tables:
+        return SQLITE_TABLE
+    raise ValueError(f"SQLite source has tables {tables}; name the cohort table '{SQLITE_TABLE}'")
+
+
+def _iter_sqlite(path, chunksize, categorical):
+    # Read-only, so a missing file is an error rather than a new empty database
+    connection = sqlite3.connect(f"file:{os.path.abspath(path)}?mode=ro", uri=True)
+    try:
+        query = f'SELECT * FROM "{sqlite_table(connection)}"'
+        yield from pd.read_sql_query(query, connection, chunksize=chunksize)
+    finally:
+        connection.close()
+
+
+READERS = {
+    ".csv": _iter_csv,
+    ".parquet": _iter_parquet,
+    ".xlsx": _iter_excel,
+    ".sqlite": _iter_sqlite,
+    ".sqlite3": _iter_sqlite,
+    ".db": _iter_sqlite,
+}
+
+
+def iter_chunks(path, chunksize=DEFAULT_CHUNKSIZE, categorical=()):
+    """Yield DataFrames of at most ``chunksize`` rows from ``path``."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in READERS:
+        raise ValueError(f"Unsupported input format '{ext}' (expected one of {', '.join(READERS)})")
+    yield from READERS[ext](path, chunksize, categorical)
+
+
+# -----------------------
+# Validation and compaction
+# -----------------------
+def source_schema(manifest):
+    """``(numeric, categorical)`` feature names of a schema manifest."""
+    numeric = [c["name"] for c in manifest["columns"] if c["kind"] == NUMERIC]
+    categorical = [c["name"] for c in manifest["columns"] if c["kind"] != NUMERIC]
+    return numeric, categorical
+
+
+def infer_schema(chunk):
+    """``(numeric, categorical)`` feature names of a raw chunk (every column but ``Target``)."""
+    features = [col for col in chunk.columns if col != TARGET]
+    numeric = [col for col in features if pd.api.types.is_numeric_dtype(chunk[col])]
+    return numeric, [col for col in features if col not in numeric]
+
+
+def validate_chunk(chunk, numeric, categorical, first_row=0):
+    """Check one raw chunk against the schema; return its labelled rows in schema order.
+
+    ``first_row`` (the chunk's offset in the source) makes errors point at the
+    source row.  Raises ``ValueError`` on missing or unexpected columns,
+    non-numeric values in numeric features or a ``Target`` other than 0/1.
+    """
+    columns = numeric + categorical + [TARGET]
+    missing = [col for col in columns if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Cohort source is missing column(s): {', '.join(missing)}")
+    unexpected = [col for col in chunk.columns if col not in columns]
+    if unexpected:
+        raise ValueError(f"Cohort source has column(s) not in the schema: {', '.join(map(str, unexpected))} "
+                         "(rebuild schema.json with `python schema.py`)")
+    chunk = chunk[columns]
+    target = pd.to_numeric(chunk[TARGET], errors="coerce")
+    labelled = chunk[TARGET].notna()
+    bad = labelled & ~target.isin([0, 1])
+    if bad.any():
+        row = first_row + int(np.flatnonzero(bad.to_numpy())[0])
+        raise ValueError(f"Row {row}: '{TARGET}' must be 0 or 1, got {chunk[TARGET][bad].iloc[0]!r}")
+    chunk = chunk[labelled]
+
+    out = {}
+    for col in numeric:
+        values = pd.to_numeric(chunk[col], errors="coerce")
+        bad = values.isna() & chunk[col].notna()
+        if bad.any():
+            row = first_row + int(np.flatnonzero(labelled.to_numpy())[np.flatnonzero(bad.to_numpy())[0]])
+            raise ValueError(f"Row {row}: '{col}' must be numeric, got {chunk[col][bad].iloc[0]!r}")
+        out[col] = smallest_int(values.astype(np.float64))
+    for col in categorical:
+        out[col] = _str_categories(chunk[col])
+    out[TARGET] = target[labelled].astype(np.int8)
+    return pd.DataFrame(out, index=chunk.index).reset_index(drop=True)
+
+
+def _str_categories(values):
+    """``values`` as a ``category`` column of str levels (missing stays missing).
+
+    Excel hands back mixed int/str cells and the model was trained on str
+    categories.  Columns that arrive as categories (Parquet dictionaries) are
+    converted level by level instead of value by value.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        levels = values.cat.categories.astype(str)
+        if levels.is_unique:
+            return values.cat.rename_categories(levels).cat.reorder_categories(sorted(levels))
+        values = values.astype(object)
+    return values.astype(str).where(values.notna(), None).astype("category")
+
+
+def smallest_int(values):
+    """``values`` as int8/int16/int32 when they are all whole and present, else float32/float64."""
+    array = values.to_numpy()
+    if len(array) and not np.isnan(array).any() and np.array_equal(array, np.round(array)):
+        for dtype in (np.int8, np.int16, np.int32):
+            info = np.iinfo(dtype)
+            if array.min() >= info.min and array.max() <= info.max:
+                return values.astype(dtype)
+    if np.array_equal(array.astype(np.float32), array, equal_nan=True):
+        return values.astype(np.float32)
+    return values
+
+
+def combine(chunks, numeric, categorical):
+    """Concatenate validated chunks column by column, keeping every column compact."""
+    from pandas.api.types import union_categoricals
+
+    if len(chunks) == 1:
+        # Already compact; categories of a single chunk are sorted (astype("category"))
+        return chunks[0]
+    columns = {}
+    # Chunks may have settled on different types: concat widens exactly, then narrow again
+    for col in numeric:
+        columns[col] = smallest_int(pd.concat([c[col] for c in chunks], ignore_index=True))
+    for col in categorical:
+        columns[col] = pd.Series(union_categoricals([c[col] for c in chunks], sort_categories=True))
+    columns[TARGET] = pd.concat([c[TARGET] for c in chunks], ignore_index=True)
+    return pd.DataFrame({col: columns[col] for col in numeric + categorical + [TARGET]})
+
+
+def load_source(path, chunksize=DEFAULT_CHUNKSIZE, manifest=None):
+    """Stream, validate and compact the cohort at ``path``; return ``(frame, stats)``.
+
+    Columns are checked against ``manifest`` (e.g. ``load_manifest()``); with
+    none they are inferred from the source (see :func:`infer_schema`).
+    ``stats`` has the source format, rows read and kept, chunks, seconds and
+    the frame's in-memory bytes.
+    """
+    start = time.perf_counter()
+    numeric, categorical = source_schema(manifest) if manifest is not None else (None, ())
+    chunks, rows_read = [], 0
+    for raw in iter_chunks(path, chunksize, categorical):
+        if numeric is None:
+            numeric, categorical = infer_schema(raw)
+        chunks.append(validate_chunk(raw, numeric, categorical, first_row=rows_read))
+        rows_read += len(raw)
+    if not chunks:
+        raise ValueError(f"Cohort source {path} has no rows")
+    frame = combine(chunks, numeric, categorical)
+    stats = {
+        "source": os.path.basename(path),
+        "format": os.path.splitext(path)[1].lower().lstrip("."),
+        "rows_read": rows_read,
+        "rows": len(frame),
+        "chunks": len(chunks),
+        "seconds": time.perf_counter() - start,
+        "frame_bytes": int(frame.memory_usage(deep=True).sum()),
+    }
+    return frame, stats
+
+
+def main(argv=None):
+    import tracemalloc
+
+    parser = argparse.ArgumentParser(description="Load cohort sources and report time and memory.")
+    parser.add_argument("paths", nargs="+", help="Excel, CSV, Parquet or SQLite cohort files")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE)
+    parser.add_argument("--memory", action="store_true",
+                        help="Also trace peak Python memory (slows loading down considerably)")
+    parser.add_argument("--infer", action="store_true", help="Infer the columns instead of using schema.json")
+    args = parser.parse_args(argv)
+    manifest = None if args.infer else load_manifest(DEFAULT_SCHEMA_PATH)
+
+    print(f"{'source':<28}{'format':>8}{'rows':>12}{'chunks':>8}{'seconds':>10}{'peak MiB':>10}{'frame MiB':>11}")
+    for path in args.paths:
+        if args.memory:
+            tracemalloc.start()
+        try:
+            frame, stats = load_source(path, args.chunksize, manifest)
+        except ValueError as exc:
+            print(f"{os.path.basename(path):<28} error: {exc}")
+            continue
+        finally:
+            peak = f"{tracemalloc.get_traced_memory()[1] / 2**20:.1f}" if args.memory else "-"
+            tracemalloc.stop()
+        print(f"{stats['source']:<28}{stats['format']:>8}{stats['rows']:>12,}{stats['chunks']:>8}"
+              f"{stats['seconds']:>10.2f}{peak:>10}{stats['frame_bytes'] / 2**20:>11.1f}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,464 @@
+"""Read-only, memory-mapped cohort store shared by sessions and processes.
+
+Everything the report needs from the cohort - the similarity matrix (one-hot
+rows bit-packed into uint64 words, see :class:`similarity.BitsetBackend`),
+Age (``int16`` whole years, :data:`similarity.AGE_MISSING` when unknown),
+Target and the PCA coordinates - is written once per cohort version as raw
+arrays under ``.cache/store`` and opened with ``np.memmap``.
+The arrays are then backed by the OS page cache: every session in a process
+shares one mapping, and every app process on the host maps the same physical
+pages, so adding sessions or worker processes no longer adds copies of the
+cohort.  The small fitted objects (encoders, PCA) are kept alongside in
+``meta-<batches>.joblib``, the file named by ``state.json``.
+
+Opening an existing store does not parse the cohort file at all (only its
+content hash is needed).
+
+Incremental growth
+------------------
+:func:`ingest` appends newly labelled patients without refitting: the rows
+are encoded with the fitted similarity encoder, folded into the running
+scaler statistics and the incremental PCA, and appended to the array files.
+The work is proportional to the batch.  Each ingest gets a new store
+``version`` (it names the rows in the store).  Rows already in the store keep
+the coordinates they were given until :func:`compact` rebuilds everything
+exactly from the source file plus every ingested batch; that keeps the
+``version`` but refits, so caches of fitted results (projections, similar
+patients, charts) key on :attr:`CohortStore.fit_version`.
+Ingested batches are kept as Parquet under ``batches/``.
+
+Layout (``state.json`` is the commit point; readers never see partial writes)::
+
+    .cache/store/<cohort hash>-v5/
+        CURRENT                     name of the live generation
+        batches/batch-000001.parquet
+        gen-000001/state.json  meta-000000.joblib  matrix.bin  age.bin  target.bin  coords.bin
+
+Command line::
+
+    python cohort_store.py build                  # build the store for Data_health1.xlsx
+    python cohort_store.py ingest new.csv         # append labelled patients
+    python cohort_store.py compact                # exact rebuild
+    python cohort_store.py compact --every 3600   # ... periodically
+
+``python -m benchmarks.memory`` reports the resident-memory savings.
+"""
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # no cross-process writer lock (e.g. Windows); threads are still serialised
+    fcntl = None
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from cohort import CACHE_DIR, DEFAULT_DATA_PATH, TARGET, cohort_version, normalize_categories, read_cohort
+from projection import Projection
+from similarity import AGE_MISSING, BACKENDS, DEFAULT_BACKEND, SimilarityIndex, normalize_rows, unpack_rows
+
+# Bump when the layout below changes so stale stores are not reused.
+STORE_FORMAT = 5
+ARRAYS = {"matrix": np.uint64, "age": np.int16, "target": np.int8, "coords": np.float32}
+# The matrix is stored packed unless a similarity feature is numeric.
+PACKED_ENCODING = "bitset"
+FLOAT_ENCODING = "brute"
+
+_lock = threading.Lock()
+_write_lock = threading.Lock()
+_stores = {}
+
+
+def store_root(version):
+    return os.path.join(CACHE_DIR, "store", f"{version[:16]}-v{STORE_FORMAT}")
+
+
+def _write_json(path, payload):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(payload, fh, indent=2)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+@contextlib.contextmanager
+def _writer_lock(root):
+    """Serialise ingest/compaction across threads and (where supported) processes."""
+    os.makedirs(root, exist_ok=True)
+    with _write_lock, open(os.path.join(root, ".lock"), "a+b") as fh:
+        if fcntl is not None:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _dtypes(state):
+    """Array dtypes of a generation: the matrix is float32 unless it is bit-packed."""
+    dtypes = dict(ARRAYS)
+    if state["encoding"] == FLOAT_ENCODING:
+        dtypes["matrix"] = np.float32
+    return dtypes
+
+
+def _age_array(values):
+    """Age as ``int16`` whole years, :data:`AGE_MISSING` where it is unknown."""
+    age = pd.to_numeric(pd.Series(np.asarray(values)), errors="coerce").to_numpy(dtype=np.float64)
+    missing = np.isnan(age)
+    age = np.rint(np.where(missing, 0, age))
+    if np.abs(age).max(initial=0) > np.iinfo(np.int16).max:
+        raise ValueError("'Age' is out of range for the cohort store")
+    age = age.astype(np.int16)
+    age[missing] = AGE_MISSING
+    return age
+
+
+def _meta_name(batches):
+    """Meta file of a generation once ``batches`` batches are folded in."""
+    return f"meta-{batches:06d}.joblib"
+
+
+def _write_meta(directory, name, meta):
+    tmp = os.path.join(directory, f"{name}.{os.getpid()}.tmp")
+    joblib.dump(meta, tmp)
+    os.replace(tmp, os.path.join(directory, name))
+
+
+def _current_generation(root):
+    try:
+        with open(os.path.join(root, "CURRENT"), encoding="ascii") as fh:
+            return fh.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _version(base_version, digests):
+    """The store version: the cohort hash until anything is ingested."""
+    if not digests:
+        return base_version
+    raw = json.dumps([base_version, digests])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class CohortStore:
+    """Memory-mapped arrays of the live store generation plus its fitted encoders."""
+
+    def __init__(self, root, base_version):
+        self.root = root
+        self.base_version = base_version
+        self.generation_name = _current_generation(root)
+        self.directory = os.path.join(root, self.generation_name)
+        with open(os.path.join(self.directory, "state.json"), encoding="utf-8") as fh:
+            self.state = json.load(fh)
+        self.version = self.state["version"]
+        self.rows = self.state["rows"]
+
+        arrays = {name: np.memmap(os.path.join(self.directory, f"{name}.bin"), dtype=dtype, mode="r",
+                                  shape=self._shape(name))
+                  for name, dtype in _dtypes(self.state).items()}
+        self.matrix = arrays["matrix"]
+        self.age = arrays["age"]
+        self.target = arrays["target"]
+        meta = joblib.load(os.path.join(self.directory, self.state["meta"]))
+        self.similarity = meta["similarity"]
+        projection = meta["projection"]
+        self.projection = Projection(projection["preprocessor"], projection["pca"], projection["numerical_cols"],
+                                     projection["categorical_cols"], arrays["coords"], self.target)
+        self._indexes = {}
+
+    def _shape(self, name, rows=None):
+        rows = self.rows if rows is None else rows
+        if name == "matrix":
+            return (rows, self.state["dim"])
+        if name == "coords":
+            return (rows, 2)
+        return (rows,)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.matrix, self.age, self.target, self.projection.coords))
+
+    @property
+    def fit_version(self):
+        """Names the fitted encoders and coordinates: changes on every ingest and compaction."""
+        return f"{self.version}-{self.generation_name}"
+
+    @property
+    def pending(self):
+        """Rows appended by :func:`ingest` since the generation was built."""
+        return self.state["appended_rows"]
+
+    @property
+    def encoding(self):
+        """The backend whose matrix layout is stored: ``bitset`` (packed) or ``brute`` (float32)."""
+        return self.state["encoding"]
+
+    def index(self, backend=DEFAULT_BACKEND):
+        """The :class:`SimilarityIndex` over the mapped matrix.
+
+        Backends using the stored layout share the mapping; the others get an
+        in-memory copy of the matrix in their layout.  A float store (numeric
+        similarity features) answers ``bitset`` requests with ``brute``.
+        """
+        if BACKENDS[backend].packed and self.encoding == FLOAT_ENCODING:
+            backend = FLOAT_ENCODING
+        index = self._indexes.get(backend)
+        if index is None:
+            with _lock:
+                index = self._indexes.get(backend)
+                if index is None:
+                    matrix = self.matrix
+                    if BACKENDS[backend].packed != BACKENDS[self.encoding].packed:
+                        matrix = normalize_rows(unpack_rows(self.matrix, self.state["width"]))
+                    index = self._indexes[backend] = SimilarityIndex(
+                        matrix=matrix, age=self.age, target=self.target, backend=backend, **self.similarity)
+        return index
+
+
+# -----------------------
+# Building and compaction
+# -----------------------
+def _build_generation(root, generation, frame, base_version, batches, digests):
+    """Fit encoders and PCA on ``frame`` and write generation ``generation`` (not yet live)."""
+    try:
+        index = SimilarityIndex.fit(frame, backend=PACKED_ENCODING)
+    except ValueError:
+        # Numeric similarity features cannot be bit-packed
+        index = SimilarityIndex.fit(frame, backend=FLOAT_ENCODING)
+    projection = Projection.fit(frame, incremental=True)
+    arrays = {"matrix": index.matrix, "age": _age_array(index.age), "target": index.target, "coords": projection.coords}
+
+    name = f"gen-{generation:06d}"
+    tmp = os.path.join(root, f"{name}.{os.getpid()}.tmp")
+    os.makedirs(tmp, exist_ok=True)
+    encoding = PACKED_ENCODING if index.packed else FLOAT_ENCODING
+    for key, dtype in _dtypes({"encoding": encoding}).items():
+        try:
+            array = np.ascontiguousarray(arrays[key], dtype=dtype)
+        except (TypeError, ValueError):
+            raise ValueError(f"Cohort column for '{key}' is not numeric and cannot be memory-mapped")
+        array.tofile(os.path.join(tmp, f"{key}.bin"))
+    meta = _meta_name(len(batches))
+    _write_meta(tmp, meta, {
+        "similarity": {"features": index.features, "categorical_cols": index.categorical_cols,
+                       "preprocessor": index.preprocessor},
+        "projection": {"preprocessor": projection.preprocessor, "pca": projection.pca,
+                       "numerical_cols": projection.numerical_cols,
+                       "categorical_cols": projection.categorical_cols},
+    })
+    _write_json(os.path.join(tmp, "state.json"), {
+        "version": _version(base_version, digests),
+        "generation": generation,
+        "meta": meta,
+        "rows": len(frame),
+        "encoding": encoding,
+        "dim": int(index.matrix.shape[1]),
+        "width": int(len(index.preprocessor.get_feature_names_out())),
+        "columns": [str(c) for c in frame.columns],
+        "batches": batches,
+        "digests": digests,
+        "appended_rows": 0,
+        "built_at": time.time(),
+    })
+    os.replace(tmp, os.path.join(root, name))
+    return name
+
+
+def _publish(root, name):
+    """Make generation ``name`` live and delete the older ones."""
+    with open(os.path.join(root, "CURRENT.tmp"), "w", encoding="ascii") as fh:
+        fh.write(name)
+    os.replace(os.path.join(root, "CURRENT.tmp"), os.path.join(root, "CURRENT"))
+    for entry in os.listdir(root):
+        # Mapped files stay valid for readers that still have them open.
+        if entry.startswith("gen-") and entry != name and not entry.endswith(".tmp"):
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+
+
+def stored_frame(data_path=DEFAULT_DATA_PATH):
+    """The full cohort the store describes: the source file plus every ingested batch."""
+    store = load_store(data_path)
+    frames = [read_cohort(data_path)]
+    frames += [pd.read_parquet(os.path.join(store.root, "batches", name)) for name in store.state["batches"]]
+    return pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+
+def compact(data_path=DEFAULT_DATA_PATH):
+    """Rebuild the store exactly (full refit) from the source file and all ingested batches."""
+    store = load_store(data_path)
+    with _writer_lock(store.root):
+        store = CohortStore(store.root, store.base_version)
+        frame = stored_frame(data_path)
+        name = _build_generation(store.root, store.state["generation"] + 1, frame, store.base_version,
+                                 store.state["batches"], store.state["digests"])
+        _publish(store.root, name)
+    return load_store(data_path)
+
+
+def load_store(data_path=DEFAULT_DATA_PATH):
+    """Return the live :class:`CohortStore` for ``data_path``, building it at most once per host.
+
+    A warm call costs a stat of the source file and of the live generation,
+    so ingests and compactions made by other processes are picked up.
+    """
+    version = cohort_version(data_path)
+    root = store_root(version)
+    generation = _current_generation(root)
+    if generation is None:
+        with _writer_lock(root):
+            if _current_generation(root) is None:
+                frame = read_cohort(data_path)
+                _publish(root, _build_generation(root, 1, frame, version, [], []))
+        generation = _current_generation(root)
+    stamp = (generation, os.stat(os.path.join(root, generation, "state.json")).st_mtime_ns)
+
+    cached = _stores.get(version)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with _lock:
+        cached = _stores.get(version)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        store = CohortStore(root, version)
+        _stores[version] = (stamp, store)
+        return store
+
+
+# -----------------------
+# Incremental ingestion
+# -----------------------
+def _validate_batch(rows, store):
+    columns = store.state["columns"]
+    missing = [c for c in columns if c not in rows.columns]
+    if missing:
+        raise ValueError(f"New patients are missing column(s): {', '.join(missing)}")
+    rows = normalize_categories(rows[columns].copy())
+    target = pd.to_numeric(rows[TARGET], errors="coerce")
+    if target.isna().any() or not target.isin([0, 1]).all():
+        raise ValueError(f"'{TARGET}' must be 0 (control) or 1 (case) for every new patient")
+    rows[TARGET] = target.astype(np.int64)
+    for col in store.projection.numerical_cols:
+        rows[col] = pd.to_numeric(rows[col], errors="coerce")
+    return rows.reset_index(drop=True)
+
+
+def _append(path, array, offset):
+    """Write ``array`` at byte ``offset`` (dropping any uncommitted tail) and fsync."""
+    with open(path, "r+b") as fh:
+        fh.truncate(offset)
+        fh.seek(offset)
+        fh.write(array.tobytes())
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+def ingest(rows, data_path=DEFAULT_DATA_PATH):
+    """Append labelled patients (a DataFrame with every cohort column) to the store.
+
+    Returns the updated :class:`CohortStore`.  Raises ``ValueError`` if
+    columns are missing or ``Target`` is not 0/1.
+    """
+    store = load_store(data_path)
+    with _writer_lock(store.root):
+        store = CohortStore(store.root, store.base_version)
+        rows = _validate_batch(rows, store)
+        if rows.empty:
+            return store
+        state = dict(store.state)
+
+        batch_dir = os.path.join(store.root, "batches")
+        os.makedirs(batch_dir, exist_ok=True)
+        name = f"batch-{len(state['batches']) + 1:06d}.parquet"
+        tmp = os.path.join(batch_dir, f"{name}.{os.getpid()}.tmp")
+        rows.to_parquet(tmp, index=False)
+        digest = hashlib.sha256(open(tmp, "rb").read()).hexdigest()
+        os.replace(tmp, os.path.join(batch_dir, name))
+
+        # Encode with the live encoders; fold the batch into a private copy of
+        # the projection so readers of the current meta are not disturbed.
+        meta = joblib.load(os.path.join(store.directory, state["meta"]))
+        projection = Projection(meta["projection"]["preprocessor"], meta["projection"]["pca"],
+                                meta["projection"]["numerical_cols"], meta["projection"]["categorical_cols"],
+                                None, None)
+        arrays = {
+            "matrix": store.index(store.encoding).encode(rows),
+            "age": _age_array(rows["Age"]),
+            "target": rows[TARGET].to_numpy(),
+            "coords": projection.partial_fit(rows),
+        }
+        for key, dtype in _dtypes(state).items():
+            array = np.ascontiguousarray(arrays[key], dtype=dtype)
+            offset = int(np.prod(store._shape(key))) * np.dtype(dtype).itemsize
+            _append(os.path.join(store.directory, f"{key}.bin"), array, offset)
+
+        # The updated statistics go to a new file that only the new state.json
+        # names, so a crash before the commit leaves the live meta untouched.
+        meta["projection"]["pca"] = projection.pca
+        meta["projection"]["preprocessor"] = projection.preprocessor
+        previous = state["meta"]
+        state["meta"] = _meta_name(len(state["batches"]) + 1)
+        _write_meta(store.directory, state["meta"], meta)
+
+        state["rows"] += len(rows)
+        state["appended_rows"] += len(rows)
+        state["batches"] = state["batches"] + [name]
+        state["digests"] = state["digests"] + [digest]
+        state["version"] = _version(store.base_version, state["digests"])
+        _write_json(os.path.join(store.directory, "state.json"), state)
+        # Keep the previous meta for readers that loaded the old state.json
+        for entry in os.listdir(store.directory):
+            if entry.startswith("meta-") and entry not in (state["meta"], previous):
+                os.remove(os.path.join(store.directory, entry))
+    return load_store(data_path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build, grow and compact the memory-mapped cohort store.")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH, help="Source cohort file")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("build", help="Build the store (default)")
+    ingest_cmd = sub.add_parser("ingest", help="Append labelled patients from a CSV/Parquet/Excel file")
+    ingest_cmd.add_argument("path")
+    compact_cmd = sub.add_parser("compact", help="Rebuild exactly from the source file and all batches")
+    compact_cmd.add_argument("--every", type=float, help="Repeat every N seconds (runs until interrupted)")
+    compact_cmd.add_argument("--min-pending", type=int, default=1,
+                             help="Skip the rebuild unless at least this many rows were ingested since the last")
+    args = parser.parse_args(argv)
+
+    if args.command == "ingest":
+        from cohort_sources import load_source
+        from schema import load_manifest
+        start = time.perf_counter()
+        store = ingest(load_source(args.path, manifest=load_manifest())[0], args.data)
+        print(f"Ingested into {store.directory} in {time.perf_counter() - start:.3f}s: "
+              f"{store.rows:,} patients, {store.pending:,} pending compaction, version {store.version[:12]}")
+    elif args.command == "compact":
+        while True:
+            store = load_store(args.data)
+            if store.pending >= args.min_pending:
+                start = time.perf_counter()
+                store = compact(args.data)
+                print(f"Compacted {store.directory} in {time.perf_counter() - start:.3f}s: "
+                      f"{store.rows:,} patients, version {store.version[:12]}", flush=True)
+            if not args.every:
+                break
+            time.sleep(args.every)
+    else:
+        store = load_store(args.data)
+        print(f"{store.directory}: {store.rows:,} patients, {store.nbytes:,} bytes mapped")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+"""Opt-in per-stage latency instrumentation.
+
+Set ``MYHEARTRISK_PROFILE=1`` (or open the app with ``?debug=1``) to time
+each named stage of the report pipeline::
+
+    trace = Trace("report", enabled=profiling_enabled())
+    with trace.stage("predict"):
+        ...
+    trace.finish()
+
+Finished traces feed a process-wide :data:`STATS` aggregator (p50/p95/p99
+over a rolling window per stage) and are appended as one JSON line each to
+``logs/timings.jsonl``.  When disabled, ``stage()`` is a no-op.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+mainpath = os.path.dirname(os.path.abspath(__file__))
+TIMINGS_PATH = os.environ.get("MYHEARTRISK_TIMINGS_PATH", os.path.join(mainpath, "logs", "timings.jsonl"))
+WINDOW = 10_000
+
+
+def profiling_enabled():
+    return os.environ.get("MYHEARTRISK_PROFILE", "").lower() in ("1", "true", "yes")
+
+
+def percentiles(values, qs=(50, 95, 99)):
+    """Return ``{"p50": ..., ...}`` for ``values`` (empty dict if there are none)."""
+    if len(values) == 0:
+        return {}
+    return {f"p{q}": float(v) for q, v in zip(qs, np.percentile(np.asarray(values), qs))}
+
+
+class StageStats:
+    """Rolling per-stage latency samples (milliseconds)."""
+
+    def __init__(self, window=WINDOW):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, ms):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+            samples.append(ms)
+
+    def summary(self):
+        """``{stage: {"count", "p50", "p95", "p99"}}`` over the current window."""
+        with self._lock:
+            snapshot = {stage: list(samples) for stage, samples in self._samples.items()}
+        return {stage: {"count": len(samples), **percentiles(samples)}
+                for stage, samples in snapshot.items()}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+STATS = StageStats()
+
+_write_lock = threading.Lock()
+
+
+class Trace:
+    """Stage timings for a single request."""
+
+    def __init__(self, name, enabled=None, stats=STATS, path=TIMINGS_PATH):
+        self.name = name
+        self.enabled = profiling_enabled() if enabled is None else enabled
+        self.stats = stats
+        self.path = path
+        self.id = uuid.uuid4().hex[:12]
+        self.stages = {}
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def finish(self):
+        """Record the stages into the aggregator and the JSONL file."""
+        if not self.enabled:
+            return
+        total = (time.perf_counter() - self._start) * 1000
+        for stage, ms in self.stages.items():
+            self.stats.record(stage, ms)
+        self.stats.record("total", total)
+        if self.path:
+            record = {"ts": time.time(), "trace": self.name, "id": self.id,
+                      "total_ms": round(total, 3),
+                      "stages_ms": {k: round(v, 3) for k, v in self.stages.items()}}
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with _write_lock, open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(json.dumps(record) + "\n")
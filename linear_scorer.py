@@ -0,0 +1,295 @@
+"""Compiled NumPy scorer for the deployed logistic-regression pipeline.
+
+``model.joblib`` is an sklearn Pipeline (median-impute + scale ``Age``,
+constant-impute + one-hot the categoricals, LogisticRegression).  Because the
+model is linear, the whole pipeline folds into a handful of arrays: the
+numeric fill/mean/scale/coefficient per numeric column, and one weight per
+category level.  A prediction is then the intercept plus one lookup or
+multiply-add per feature::
+
+    python linear_scorer.py export            # writes model.npz next to model.joblib
+    python linear_scorer.py export --check    # ... and verifies parity with sklearn
+
+The app (``MYHEARTRISK_SCORER=numpy``) and ``batch_score.py --scorer numpy``
+can opt into it.
+"""
+import argparse
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+mainpath = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_NPZ_PATH = os.path.join(mainpath, r'model.npz')
+
+_lock = threading.Lock()
+_scorers = {}
+
+
+def _is_missing(value):
+    return value is None or (isinstance(value, float) and np.isnan(value))
+
+
+class LinearScorer:
+    """Pure-NumPy evaluation of the compiled pipeline."""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self.feature_order = [str(f) for f in arrays["feature_order"]]
+        self.classes_ = arrays["classes"]
+        self.intercept = float(arrays["intercept"][0])
+        self.version = str(arrays["model_version"][0])
+
+        self.num_features = [str(f) for f in arrays["num_features"]]
+        self.num_fill = arrays["num_fill"]
+        self.num_mean = arrays["num_mean"]
+        self.num_scale = arrays["num_scale"]
+        # Fold scaling into the coefficient: w * (x - mean) / scale
+        self.num_weight = arrays["num_coef"] / arrays["num_scale"]
+
+        self.cat_features = [str(f) for f in arrays["cat_features"]]
+        self.cat_fill = [str(f) for f in arrays["cat_fill"]]
+        offsets = arrays["cat_offsets"]
+        self.cat_levels, self.cat_weights, self.cat_lookup = [], [], []
+        for i in range(len(self.cat_features)):
+            levels = arrays["cat_levels"][offsets[i]:offsets[i + 1]]
+            weights = arrays["cat_coef"][offsets[i]:offsets[i + 1]]
+            order = np.argsort(levels)
+            self.cat_levels.append(levels[order])
+            self.cat_weights.append(weights[order])
+            self.cat_lookup.append(dict(zip((str(v) for v in levels), weights.tolist())))
+
+    # -----------------------
+    # Export / load
+    # -----------------------
+    @classmethod
+    def from_pipeline(cls, model, version=""):
+        """Compile an sklearn ``Pipeline(preproc=ColumnTransformer, clf=LogisticRegression)``."""
+        preproc, clf = model.steps[0][1], model.steps[-1][1]
+        if len(model.steps) != 2 or not hasattr(clf, "coef_") or clf.coef_.shape[0] != 1:
+            raise ValueError("Expected a two-step pipeline ending in a binary linear classifier")
+        coef = clf.coef_[0]
+
+        num_features, num_fill, num_mean, num_scale, num_coef = [], [], [], [], []
+        cat_features, cat_fill, cat_levels, cat_offsets, cat_coef = [], [], [], [0], []
+        for name, transformer, columns in preproc.transformers_:
+            if transformer == "drop" or name == "remainder":
+                continue
+            block = coef[preproc.output_indices_[name]]
+            steps = dict(transformer.steps)
+            if "scaler" in steps:
+                num_features += list(columns)
+                num_fill += list(steps["imputer"].statistics_)
+                num_mean += list(steps["scaler"].mean_)
+                num_scale += list(steps["scaler"].scale_)
+                num_coef += list(block)
+            elif "onehot" in steps:
+                onehot = steps["onehot"]
+                if onehot.drop_idx_ is not None:
+                    raise ValueError("One-hot encoders with 'drop' are not supported")
+                start = 0
+                for col, levels in zip(columns, onehot.categories_):
+                    cat_features.append(col)
+                    cat_fill.append(str(steps["imputer"].fill_value) if steps["imputer"].strategy == "constant"
+                                    else str(steps["imputer"].statistics_[len(cat_features) - 1]))
+                    cat_levels += [str(v) for v in levels]
+                    cat_coef += list(block[start:start + len(levels)])
+                    start += len(levels)
+                    cat_offsets.append(len(cat_levels))
+            else:
+                raise ValueError(f"Unsupported transformer '{name}'")
+
+        return cls({
+            "feature_order": np.array(model.feature_names_in_, dtype=str),
+            "classes": np.asarray(clf.classes_),
+            "intercept": np.array([clf.intercept_[0]], dtype=np.float64),
+            "model_version": np.array([version], dtype=str),
+            "num_features": np.array(num_features, dtype=str),
+            "num_fill": np.array(num_fill, dtype=np.float64),
+            "num_mean": np.array(num_mean, dtype=np.float64),
+            "num_scale": np.array(num_scale, dtype=np.float64),
+            "num_coef": np.array(num_coef, dtype=np.float64),
+            "cat_features": np.array(cat_features, dtype=str),
+            "cat_fill": np.array(cat_fill, dtype=str),
+            "cat_levels": np.array(cat_levels, dtype=str),
+            "cat_offsets": np.array(cat_offsets, dtype=np.int64),
+            "cat_coef": np.array(cat_coef, dtype=np.float64),
+        })
+
+    def save(self, path=DEFAULT_NPZ_PATH):
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, **self.arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=DEFAULT_NPZ_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls({key: data[key] for key in data.files})
+
+    # -----------------------
+    # Scoring
+    # -----------------------
+    def decision_dict(self, row):
+        """Logit for one patient given as ``{feature: value}``."""
+        z = self.intercept
+        for i, col in enumerate(self.num_features):
+            value = row.get(col)
+            x = self.num_fill[i] if _is_missing(value) else float(value)
+            z += (x - self.num_mean[i]) * self.num_weight[i]
+        for i, col in enumerate(self.cat_features):
+            value = row.get(col)
+            z += self.cat_lookup[i].get(self.cat_fill[i] if _is_missing(value) else str(value), 0.0)
+        return z
+
+    def predict_proba_dict(self, row):
+        """``[P(control), P(case)]`` for one patient given as a dict."""
+        p = 1.0 / (1.0 + np.exp(-self.decision_dict(row)))
+        return np.array([1.0 - p, p])
+
+    def decision_dicts(self, rows):
+        """Vectorised logits for a list of ``{feature: value}`` dicts (no DataFrame needed)."""
+        z = np.full(len(rows), self.intercept)
+        for i, col in enumerate(self.num_features):
+            x = np.array([self.num_fill[i] if _is_missing(row.get(col)) else float(row[col]) for row in rows])
+            z += (x - self.num_mean[i]) * self.num_weight[i]
+        for i, col in enumerate(self.cat_features):
+            lookup, fill = self.cat_lookup[i], self.cat_fill[i]
+            z += np.array([lookup.get(fill if _is_missing(row.get(col)) else str(row[col]), 0.0) for row in rows])
+        return z
+
+    def predict_proba_dicts(self, rows):
+        """``[P(control), P(case)]`` per row for a list of dicts."""
+        p = 1.0 / (1.0 + np.exp(-self.decision_dicts(rows)))
+        return np.column_stack([1.0 - p, p])
+
+    @property
+    def term_features(self):
+        """Column order of :meth:`feature_terms`: the numeric, then the categorical features."""
+        return self.num_features + self.cat_features
+
+    def feature_terms_dict(self, row):
+        """Each feature's additive term of the logit for one patient given as a dict."""
+        terms = np.empty(len(self.num_features) + len(self.cat_features))
+        for i, col in enumerate(self.num_features):
+            value = row.get(col)
+            x = self.num_fill[i] if _is_missing(value) else float(value)
+            terms[i] = (x - self.num_mean[i]) * self.num_weight[i]
+        offset = len(self.num_features)
+        for i, col in enumerate(self.cat_features):
+            value = row.get(col)
+            terms[offset + i] = self.cat_lookup[i].get(self.cat_fill[i] if _is_missing(value) else str(value), 0.0)
+        return terms
+
+    def feature_terms(self, rows):
+        """Per-feature logit terms, shape ``(rows, features)`` in :attr:`term_features` order.
+
+        ``rows`` is a DataFrame, or a 2-D array in ``feature_order``.  The
+        logit is ``intercept + terms.sum(axis=1)``.
+        """
+        if not isinstance(rows, pd.DataFrame):
+            rows = pd.DataFrame(np.asarray(rows, dtype=object), columns=self.feature_order)
+        terms = np.empty((len(rows), len(self.num_features) + len(self.cat_features)))
+        for i, col in enumerate(self.num_features):
+            x = pd.to_numeric(rows[col], errors="coerce").to_numpy(dtype=np.float64)
+            x = np.where(np.isnan(x), self.num_fill[i], x)
+            terms[:, i] = (x - self.num_mean[i]) * self.num_weight[i]
+        offset = len(self.num_features)
+        for i, col in enumerate(self.cat_features):
+            values = rows[col]
+            values = values.astype(str).where(values.notna(), self.cat_fill[i]).to_numpy(dtype=str)
+            levels = self.cat_levels[i]
+            pos = np.minimum(np.searchsorted(levels, values), len(levels) - 1)
+            terms[:, offset + i] = np.where(levels[pos] == values, self.cat_weights[i][pos], 0.0)
+        return terms
+
+    def decision_function(self, rows):
+        """Vectorised logits for a DataFrame, or a 2-D array in ``feature_order``."""
+        return self.intercept + self.feature_terms(rows).sum(axis=1)
+
+    def predict_proba(self, rows):
+        p = 1.0 / (1.0 + np.exp(-self.decision_function(rows)))
+        return np.column_stack([1.0 - p, p])
+
+    def predict(self, rows):
+        return self.classes_[(self.decision_function(rows) > 0).astype(int)]
+
+
+def load_scorer(loaded_model, npz_path=None):
+    """Return the :class:`LinearScorer` for a registry ``LoadedModel``.
+
+    Uses ``npz_path`` (default: the model path with a ``.npz`` suffix) when it
+    was exported from the same model version, otherwise compiles the pipeline
+    and re-exports it.
+    """
+    npz_path = npz_path or os.path.splitext(loaded_model.path)[0] + ".npz"
+    scorer = _scorers.get(loaded_model.version)
+    if scorer is not None:
+        return scorer
+    with _lock:
+        scorer = _scorers.get(loaded_model.version)
+        if scorer is not None:
+            return scorer
+        if os.path.exists(npz_path):
+            scorer = LinearScorer.load(npz_path)
+        else:
+            scorer = None
+        if scorer is None or scorer.version != loaded_model.version:
+            scorer = LinearScorer.from_pipeline(loaded_model.model, version=loaded_model.version)
+            scorer.save(npz_path)
+        _scorers[loaded_model.version] = scorer
+        return scorer
+
+
+def check_parity(model, scorer, frame, atol=1e-9):
+    """Compare sklearn and the scorer on ``frame``; return the max probability gap."""
+    expected = model.predict_proba(frame)
+    batched = scorer.predict_proba(frame)
+    single = np.array([scorer.predict_proba_dict(row) for row in frame.to_dict(orient="records")])
+    array = scorer.predict_proba(frame[scorer.feature_order].to_numpy(dtype=object))
+    gap = max(np.abs(expected - got).max() for got in (batched, single, array))
+    if gap > atol or not np.array_equal(model.predict(frame), scorer.predict(frame)):
+        raise AssertionError(f"NumPy scorer disagrees with the sklearn pipeline (max gap {gap:.3g})")
+    return gap
+
+
+def main(argv=None):
+    from model_registry import DEFAULT_MODEL_PATH, get_registry
+
+    parser = argparse.ArgumentParser(description="Compile model.joblib into a NumPy scorer artifact.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Write the .npz artifact")
+    export.add_argument("--model", default=DEFAULT_MODEL_PATH)
+    export.add_argument("--output", default=DEFAULT_NPZ_PATH)
+    export.add_argument("--check", action="store_true",
+                        help="Verify parity with sklearn on the cohort and synthetic patients")
+    args = parser.parse_args(argv)
+
+    loaded = get_registry(args.model).current()
+    scorer = LinearScorer.from_pipeline(loaded.model, version=loaded.version)
+    scorer.save(args.output)
+    print(f"Wrote {args.output} ({os.path.getsize(args.output):,} bytes, model version {loaded.version})")
+
+    if args.check:
+        from benchmarks.synthetic import synthetic_cohort
+        from cohort import load_cohort
+
+        frames = {
+            "cohort": load_cohort().frame.drop(columns="Target"),
+            "synthetic": synthetic_cohort(10_000, seed=1).drop(columns="Target"),
+        }
+        # Missing and unseen values must fall through exactly as in sklearn.
+        edge = frames["cohort"].head(20).astype(object)
+        edge.iloc[::2, 1:] = None
+        edge.iloc[1::2, 2] = "unseen level"
+        edge.iloc[::3, 0] = np.nan
+        frames["missing/unseen"] = edge
+        reloaded = LinearScorer.load(args.output)
+        for name, frame in frames.items():
+            gap = check_parity(loaded.model, reloaded, frame)
+            print(f"parity {name:<15} {len(frame):>6} rows  max |Δp| = {gap:.2e}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Process-wide registry for the deployed model artifact.
+
+``model.joblib`` is unpickled once per worker process and shared by every
+session.  The registry watches the file's modification time; when it changes
+the new artifact is loaded off to the side and swapped in atomically, so a
+redeploy never requires restarting the server and readers never observe a
+half-loaded model.  If the new artifact cannot be loaded yet (e.g. it is still
+being copied), the current model keeps serving and the load is retried at the
+next check.
+"""
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+import joblib
+
+from storage import file_hash
+
+mainpath = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_PATH = os.path.join(mainpath, r'model.joblib')
+logger = logging.getLogger(__name__)
+
+# How often (seconds) get() is allowed to stat the artifact.
+CHECK_INTERVAL = float(os.environ.get("MYHEARTRISK_MODEL_CHECK_INTERVAL", 2.0))
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    model: object
+    version: str
+    path: str
+    load_seconds: float
+    loaded_at: float
+    stamp: tuple
+
+
+class ModelRegistry:
+    """Holds the current :class:`LoadedModel` for one artifact path."""
+
+    def __init__(self, path=DEFAULT_MODEL_PATH, check_interval=CHECK_INTERVAL):
+        self.path = os.path.abspath(path)
+        self.check_interval = check_interval
+        self._current = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _stamp(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def _load(self, stamp):
+        start = time.perf_counter()
+        version = file_hash(self.path)[:12]
+        model = joblib.load(self.path)
+        elapsed = time.perf_counter() - start
+        self.loads += 1
+        return LoadedModel(model=model, version=version, path=self.path,
+                           load_seconds=elapsed, loaded_at=time.time(), stamp=stamp)
+
+    def current(self):
+        """Return the active :class:`LoadedModel`, reloading it if the file changed."""
+        loaded = self._current
+        now = time.monotonic()
+        if loaded is not None and now - self._last_check < self.check_interval:
+            return loaded
+
+        with self._lock:
+            loaded = self._current
+            self._last_check = now
+            try:
+                stamp = self._stamp()
+                if loaded is not None and loaded.stamp == stamp:
+                    return loaded
+                # Build the replacement completely before publishing it.
+                self._current = self._load(stamp)
+            except Exception:
+                if loaded is None:
+                    raise
+                logger.exception("could not reload %s; serving model %s until the next check",
+                                 self.path, loaded.version)
+                return loaded
+            return self._current
+
+    def get(self):
+        """Return the active model object."""
+        return self.current().model
+
+    def info(self):
+        loaded = self.current()
+        return {
+            "path": loaded.path,
+            "version": loaded.version,
+            "load_seconds": loaded.load_seconds,
+            "loaded_at": loaded.loaded_at,
+            "loads": self.loads,
+        }
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(path=DEFAULT_MODEL_PATH):
+    """Return the shared :class:`ModelRegistry` for ``path``."""
+    path = os.path.abspath(path)
+    registry = _registries.get(path)
+    if registry is None:
+        with _registries_lock:
+            registry = _registries.setdefault(path, ModelRegistry(path))
+    return registry
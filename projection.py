@@ -0,0 +1,113 @@
+"""Fit-once PCA projection of the reference cohort.
+
+The preprocessor and the 2-component PCA are fitted on the cohort alone and
+persisted together with the cohort's coordinates in the :mod:`cohort_store`
+(``python cohort_store.py build`` warms it offline).  Placing a user on the
+plot is then a single-row ``transform`` instead of a refit over the whole
+cohort, and the user's own row no longer moves the axes.
+"""
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.decomposition import PCA, IncrementalPCA
+from sklearn.impute import SimpleImputer
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+from cohort import TARGET
+
+
+def split_columns(frame, exclude=(TARGET,)):
+    """Return ``(numerical_cols, categorical_cols)`` of ``frame`` minus ``exclude``."""
+    numerical_cols = [c for c in frame.select_dtypes(include=np.number).columns if c not in exclude]
+    categorical_cols = [c for c in frame.select_dtypes(include=['object', 'category']).columns if c not in exclude]
+    return numerical_cols, categorical_cols
+
+
+def as_str_categories(frame, categorical_cols):
+    """Cast categorical columns to str, as the app always has (NaN becomes 'nan')."""
+    frame = frame.copy()
+    for col in categorical_cols:
+        frame[col] = frame[col].astype(str)
+    return frame
+
+
+def make_preprocessor(numerical_cols, categorical_cols):
+    numerical_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='mean')),
+        ('scaler', StandardScaler())
+    ])
+
+    categorical_transformer = Pipeline(steps=[
+        ('imputer', SimpleImputer(strategy='most_frequent')),
+        ('onehot', OneHotEncoder(handle_unknown='ignore'))
+    ])
+
+    return ColumnTransformer(
+        transformers=[
+            ('num', numerical_transformer, numerical_cols),
+            ('cat', categorical_transformer, categorical_cols)
+        ])
+
+
+class Projection:
+    """Preprocessor + PCA fitted on the cohort, with the cohort's coordinates."""
+
+    def __init__(self, preprocessor, pca, numerical_cols, categorical_cols, coords, target):
+        self.preprocessor = preprocessor
+        self.pca = pca
+        self.numerical_cols = numerical_cols
+        self.categorical_cols = categorical_cols
+        self.coords = coords
+        self.target = target
+
+    @classmethod
+    def fit(cls, frame, n_components=2, incremental=False):
+        """Fit on ``frame``; ``incremental=True`` uses an IncrementalPCA so :meth:`partial_fit` works.
+
+        Both are exact on the initial fit (a single batch), up to component signs.
+        """
+        numerical_cols, categorical_cols = split_columns(frame)
+        preprocessor = make_preprocessor(numerical_cols, categorical_cols)
+        processed = _dense(preprocessor.fit_transform(as_str_categories(frame, categorical_cols)))
+        if incremental:
+            pca = IncrementalPCA(n_components=n_components).partial_fit(processed)
+        else:
+            pca = PCA(n_components=n_components).fit(processed)
+        coords = pca.transform(processed).astype(np.float32)
+        target = frame[TARGET].to_numpy()
+        return cls(preprocessor, pca, numerical_cols, categorical_cols, coords, target)
+
+    def partial_fit(self, frame):
+        """Fold new labelled rows into the running statistics; return their coordinates.
+
+        The numeric scalers take the rows into their running mean/variance and
+        the IncrementalPCA (see ``fit(incremental=True)``) into its components.
+        Imputer fill values and the one-hot levels stay as fitted.  Costs time
+        proportional to ``len(frame)``; rows projected earlier keep their
+        coordinates until the next full fit.
+        """
+        rows = as_str_categories(frame, self.categorical_cols)
+        numeric = self.preprocessor.named_transformers_['num']
+        if self.numerical_cols:
+            numeric.named_steps['scaler'].partial_fit(
+                numeric.named_steps['imputer'].transform(rows[self.numerical_cols]))
+        processed = _dense(self.preprocessor.transform(rows))
+        # IncrementalPCA needs at least n_components rows per batch; smaller
+        # batches only update the scalers until the next full fit.
+        if len(processed) >= self.pca.n_components_:
+            self.pca.partial_fit(processed)
+        return self.pca.transform(processed).astype(np.float32)
+
+    @property
+    def explained_variance(self):
+        """Explained variance ratio per component, in percent."""
+        return self.pca.explained_variance_ratio_ * 100
+
+    def transform(self, rows):
+        """Project ``rows`` (a DataFrame of raw feature values) into PCA space."""
+        rows = as_str_categories(rows, self.categorical_cols)
+        return self.pca.transform(_dense(self.preprocessor.transform(rows)))
+
+
+def _dense(matrix):
+    return matrix.toarray() if hasattr(matrix, "toarray") else np.asarray(matrix)
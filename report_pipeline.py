@@ -0,0 +1,103 @@
+"""Background stages of the Report Dashboard.
+
+The risk card only needs ``predict_proba``, which does not touch the cohort,
+so the script thread renders it first.  Placing the user in the PCA
+projection and ranking similar patients both need the cohort store (built on
+first use, see :mod:`cohort_store`), so they run on a shared thread pool and
+the page fills each placeholder as its stage finishes::
+
+    job = start_report(data_path, user_data, input_df, trace)
+    for stage, future in job.as_completed():
+        ...
+    job.cancel()   # inputs changed mid-flight: drop whatever has not finished
+
+Each stage result is kept in :data:`result_cache.RESULT_CACHE` under the
+inputs and the cohort version, so repeated submissions skip the work.
+"""
+import os
+import threading
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
+
+from charts import load_background, user_trace
+from cohort_store import load_store
+from result_cache import RESULT_CACHE, result_key
+
+WORKERS = int(os.environ.get("MYHEARTRISK_REPORT_WORKERS", 4))
+TOP_K = 10
+
+_pool = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="report")
+
+
+class ReportJob:
+    """The in-flight background stages for one submission."""
+
+    def __init__(self, futures, cancelled):
+        self.futures = futures
+        self.cancelled = cancelled
+
+    def as_completed(self, timeout=None):
+        """Yield ``(stage, future)`` pairs in completion order."""
+        stages = {future: stage for stage, future in self.futures.items()}
+        for future in as_completed(stages, timeout=timeout):
+            yield stages[future], future
+
+    def cancel(self):
+        """Stop stages that have not started and tell running ones to bail out."""
+        self.cancelled.set()
+        for future in self.futures.values():
+            future.cancel()
+
+    def done(self):
+        return all(future.done() for future in self.futures.values())
+
+
+def _checkpoint(cancelled):
+    if cancelled.is_set():
+        raise CancelledError()
+
+
+def _cached_stage(stage, user_data, store, compute):
+    key = result_key(user_data, None, store.fit_version, stage=stage)
+    result = RESULT_CACHE.get(key)
+    if result is None:
+        result = compute()
+        RESULT_CACHE.put(key, result)
+    return result
+
+
+def projection_stage(data_path, user_data, input_df, trace, cancelled):
+    """Project the user into the cohort PCA; returns the point, variance, marker and background."""
+    with trace.stage("projection"):
+        store = load_store(data_path)
+        _checkpoint(cancelled)
+        projection = store.projection
+
+        def compute():
+            user_point = projection.transform(input_df)
+            return {
+                "user_point": user_point,
+                "explained_variance": float(projection.explained_variance.sum()),
+                "chart": user_trace(user_point),
+            }
+        result = _cached_stage("projection", user_data, store, compute)
+        # The background is cached per cohort by charts.py, not per submission
+        return {**result, "background": load_background(store.fit_version, projection)}
+
+
+def similarity_stage(data_path, user_data, input_df, trace, cancelled):
+    """Rank the cohort patients most similar to the user (Age excluded)."""
+    with trace.stage("similarity"):
+        store = load_store(data_path)
+        _checkpoint(cancelled)
+        index = store.index()
+        return _cached_stage("similarity", user_data, store, lambda: index.top_k(input_df, k=TOP_K))
+
+
+def start_report(data_path, user_data, input_df, trace):
+    """Submit the cohort-dependent stages; return their :class:`ReportJob`."""
+    cancelled = threading.Event()
+    args = (data_path, dict(user_data), input_df, trace, cancelled)
+    return ReportJob({
+        "projection": _pool.submit(projection_stage, *args),
+        "similarity": _pool.submit(similarity_stage, *args),
+    }, cancelled)
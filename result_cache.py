@@ -0,0 +1,99 @@
+"""Process-wide memo of finished report results.
+
+Users often toggle a parameter back and forth and many submit identical
+profiles, so each finished report stage (the prediction, the projected point and chart,
+the similar patients) is cached under a canonical hash of the sidebar inputs
+plus the model and/or cohort version it depends on.  The cache is shared by
+every session in the process and evicts least-recently-used entries once
+either the entry count or the total (pickled) size exceeds its bound.
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = int(os.environ.get("MYHEARTRISK_RESULT_CACHE_ENTRIES", 1024))
+MAX_BYTES = int(os.environ.get("MYHEARTRISK_RESULT_CACHE_MB", 64)) * 1024 * 1024
+
+
+def result_key(user_data, model_version, cohort_version, stage="report"):
+    """Canonical hash of one submission; key order and numpy scalar types do not matter.
+
+    ``stage`` separates the parts of a report that are cached independently
+    (a stage that does not depend on the model or cohort passes ``None``).
+    """
+    canonical = json.dumps(
+        {"inputs": {str(k): plain_value(v) for k, v in user_data.items()},
+         "model": model_version, "cohort": cohort_version, "stage": stage},
+        sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def plain_value(value):
+    """``value`` as a JSON scalar (numpy scalars unwrapped, whole floats as ints)."""
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value if value is None or isinstance(value, (int, float, str, bool)) else str(value)
+
+
+class ResultCache:
+    """Thread-safe LRU bounded by entry count and total size in bytes."""
+
+    def __init__(self, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+RESULT_CACHE = ResultCache()
@@ -0,0 +1,140 @@
+"""Feature schema manifest generated once from the reference cohort.
+
+``schema.json`` (stored next to ``model.joblib``) records the feature columns
+in model order, whether each is numeric or categorical, the categorical
+levels in the order the sidebar offers them, and numeric ranges and
+defaults.  The sidebar, the input DataFrame builder and the batch/HTTP
+scorers read the manifest, so none of them needs the raw dataset::
+
+    python schema.py            # regenerate from Data_health1.xlsx
+"""
+import json
+import os
+import threading
+
+# pandas (and the cohort loader) are imported where needed: the landing page
+# reads the manifest but should not pay for them.
+
+mainpath = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SCHEMA_PATH = os.path.join(mainpath, r'schema.json')
+
+NUMERIC = "numeric"
+CATEGORICAL = "categorical"
+
+_lock = threading.Lock()
+_manifests = {}
+
+
+def build_manifest(cohort):
+    """Describe the feature columns of ``cohort`` (everything but ``Target``)."""
+    import pandas as pd
+
+    from cohort import TARGET
+
+    frame = cohort.frame
+    columns = []
+    for col in cohort.features:
+        values = frame[col]
+        if pd.api.types.is_numeric_dtype(values):
+            columns.append({
+                "name": col,
+                "kind": NUMERIC,
+                # the cohort stores Age compactly (int8); the model is fed float64
+                "dtype": "float64",
+                "min": float(values.min()),
+                "max": float(values.max()),
+                "default": float(values.mean()),
+            })
+        else:
+            levels = [str(v) for v in values.dropna().unique()]
+            columns.append({
+                "name": col,
+                "kind": CATEGORICAL,
+                "dtype": "object",
+                "levels": levels,
+                "default": levels[0] if levels else None,
+            })
+    return {"target": TARGET, "cohort_version": cohort.version, "columns": columns}
+
+
+def save_manifest(manifest, path=DEFAULT_SCHEMA_PATH):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, indent=2, ensure_ascii=False)
+        fh.write("\n")
+    os.replace(tmp, path)
+
+
+def load_manifest(path=DEFAULT_SCHEMA_PATH):
+    """Return the parsed manifest, re-reading it only when the file changes."""
+    path = os.path.abspath(path)
+    stamp = os.stat(path).st_mtime_ns
+    cached = _manifests.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with _lock:
+        with open(path, encoding="utf-8") as fh:
+            manifest = json.load(fh)
+        _manifests[path] = (stamp, manifest)
+        return manifest
+
+
+def feature_names(manifest):
+    return [c["name"] for c in manifest["columns"]]
+
+
+def categorical_features(manifest):
+    return [c["name"] for c in manifest["columns"] if c["kind"] == CATEGORICAL]
+
+
+def validate_manifest(manifest, model):
+    """Raise ``ValueError`` unless the manifest's columns are exactly the model's inputs."""
+    expected = getattr(model, "feature_names_in_", None)
+    if expected is None:
+        expected = model.feature_order  # compiled LinearScorer
+    expected = [str(c) for c in expected]
+    actual = feature_names(manifest)
+    if actual != expected:
+        missing = [c for c in expected if c not in actual]
+        extra = [c for c in actual if c not in expected]
+        detail = []
+        if missing:
+            detail.append(f"missing {missing}")
+        if extra:
+            detail.append(f"unexpected {extra}")
+        if not detail:
+            detail.append("column order differs")
+        raise ValueError(f"schema.json does not match the model's expected columns: {'; '.join(detail)}")
+
+
+def input_frame(manifest, user_data):
+    """Build the one-row model input from sidebar values, in manifest order and dtypes."""
+    return input_rows(manifest, [user_data])
+
+
+def input_rows(manifest, rows):
+    """Like :func:`input_frame`, one row per dict in ``rows``."""
+    import pandas as pd
+
+    frame = {}
+    for column in manifest["columns"]:
+        values = [row.get(column["name"]) for row in rows]
+        if column["kind"] == NUMERIC:
+            frame[column["name"]] = pd.Series(values, dtype="float64")
+        else:
+            frame[column["name"]] = pd.Series([None if v is None else str(v) for v in values], dtype="object")
+    return pd.DataFrame(frame)
+
+
+if __name__ == "__main__":
+    import sys
+
+    from cohort import DEFAULT_DATA_PATH, Cohort, cohort_version
+    from cohort_sources import load_source
+
+    # Read the source itself: the cohort cache validates against the manifest being rebuilt
+    path = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DATA_PATH)
+    frame, _ = load_source(path)
+    manifest = build_manifest(Cohort(path=path, version=cohort_version(path), frame=frame))
+    save_manifest(manifest)
+    print(f"Wrote {DEFAULT_SCHEMA_PATH} ({len(manifest['columns'])} features)")
@@ -0,0 +1,294 @@
+"""Standalone ASGI scoring service.
+
+Exposes the deployed model and the similar-patients index over HTTP for
+integrations that do not go through the Streamlit UI::
+
+    uvicorn service:app --port 8000
+
+Endpoints (JSON in, JSON out):
+
+* ``POST /predict`` - ``{"patient": {<feature>: <value>, ...}}``
+* ``POST /similar`` - ``{"patient": {...}, "k": 10}``
+* ``GET  /metrics`` - latency and batch-size histograms
+* ``GET  /health``  - model and cohort versions
+
+The model and cohort are loaded once.  Concurrent ``/predict`` calls are
+coalesced by :class:`MicroBatcher` into a single vectorised ``predict_proba``
+call per time window, and every prediction is appended to the audit log
+(:mod:`audit`).  ``app`` is a plain ASGI callable, so it can be driven
+in-process (e.g. ``httpx.AsyncClient(transport=httpx.ASGITransport(app))``).
+"""
+import asyncio
+import bisect
+import json
+import os
+import time
+
+import pandas as pd
+
+from audit import AUDIT_LOG, audit
+from batch_score import feature_schema, prepare
+from cohort import DEFAULT_DATA_PATH
+from cohort_store import load_store
+from model_registry import DEFAULT_MODEL_PATH, get_registry
+from schema import DEFAULT_SCHEMA_PATH, load_manifest, validate_manifest
+
+BATCH_WINDOW = float(os.environ.get("MYHEARTRISK_BATCH_WINDOW_MS", 5)) / 1000
+MAX_BATCH = int(os.environ.get("MYHEARTRISK_MAX_BATCH", 256))
+
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus style)."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def to_dict(self):
+        cumulative, running = {}, 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            running += count
+            cumulative[str(bound)] = running
+        return {"count": self.count, "sum": self.sum, "buckets": cumulative}
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one ``predict_proba`` call."""
+
+    def __init__(self, predict_proba, window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self.predict_proba = predict_proba
+        self.window = window
+        self.max_batch = max_batch
+        self.batch_sizes = Histogram(BATCH_BUCKETS)
+        self._loop = None
+        self._queue = None
+        self._task = None
+
+    async def submit(self, row):
+        """Queue one prepared feature row; resolve to its entry of ``predict_proba``'s result."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # The queue and worker belong to one event loop; start afresh on a new
+            # one (e.g. one ``asyncio.run`` per test with an in-process client).
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._task = loop.create_task(self._run())
+        future = loop.create_future()
+        await self._queue.put((row, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            self.batch_sizes.observe(len(batch))
+            try:
+                await self._score(loop, batch)
+            except Exception as exc:
+                # Fail this batch rather than the worker, which every request awaits
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+
+    async def _score(self, loop, batch):
+        try:
+            frame = pd.concat([row for row, _ in batch], ignore_index=True)
+            probabilities = await loop.run_in_executor(None, self.predict_proba, frame)
+        except Exception:
+            # Score the rows one by one so a bad row cannot fail its neighbours
+            for row, future in batch:
+                try:
+                    proba = (await loop.run_in_executor(None, self.predict_proba, row))[0]
+                except Exception as exc:
+                    if not future.done():
+                        future.set_exception(exc)
+                else:
+                    if not future.done():
+                        future.set_result(proba)
+            return
+        for (_, future), proba in zip(batch, probabilities):
+            if not future.done():
+                future.set_result(proba)
+
+    async def close(self):
+        # A worker left on an earlier, finished loop died with it
+        if self._task is not None and self._loop is asyncio.get_running_loop():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._loop = self._queue = self._task = None
+
+
+class HTTPError(Exception):
+    def __init__(self, status, detail):
+        super().__init__(detail)
+        self.status = status
+        self.detail = detail
+
+
+class ScoringService:
+    """ASGI application serving predictions and similar patients."""
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, data_path=DEFAULT_DATA_PATH,
+                 schema_path=DEFAULT_SCHEMA_PATH):
+        self.registry = get_registry(model_path)
+        self.data_path = data_path
+        self.features, self.categorical = feature_schema(schema_path)
+        self.numerical = [col for col in self.features if col not in self.categorical]
+        validate_manifest(load_manifest(schema_path), self.registry.get())
+        self.batcher = MicroBatcher(self._predict_proba)
+        self.latency = {}
+        self.routes = {
+            ("POST", "/predict"): self.predict,
+            ("POST", "/similar"): self.similar,
+            ("GET", "/metrics"): self.metrics,
+            ("GET", "/health"): self.health,
+        }
+
+    def _predict_proba(self, frame):
+        """``(LoadedModel, probabilities)`` per row, so a reply names the model that scored it."""
+        loaded = self.registry.current()
+        return [(loaded, proba) for proba in loaded.model.predict_proba(frame)]
+
+    def _patient_frame(self, body):
+        patient = body.get("patient")
+        if not isinstance(patient, dict):
+            raise HTTPError(422, "Body must be a JSON object with a 'patient' object")
+        try:
+            frame = prepare(pd.DataFrame([patient]), self.features, self.categorical)
+        except ValueError as exc:
+            raise HTTPError(422, str(exc))
+        for col in self.numerical:
+            try:
+                frame[col] = pd.to_numeric(frame[col], errors="raise").astype("float64")
+            except (TypeError, ValueError):
+                raise HTTPError(422, f"'{col}' must be a number, got {patient.get(col)!r}")
+        return frame
+
+    # -----------------------
+    # Endpoints
+    # -----------------------
+    async def predict(self, body):
+        loaded, proba = await self.batcher.submit(self._patient_frame(body))
+        prediction = int(loaded.model.classes_[proba.argmax()])
+        version = loaded.version
+        audit(body["patient"], prediction, proba, version, source="service")
+        return {
+            "prediction": prediction,
+            "probabilities": {"control": float(proba[0]), "case": float(proba[1])},
+            "model_version": version,
+        }
+
+    async def similar(self, body):
+        frame = self._patient_frame(body)
+        k = body.get("k", 10)
+        if not isinstance(k, int) or k < 1:
+            raise HTTPError(422, "'k' must be a positive integer")
+        index = load_store(self.data_path).index()
+        table = await asyncio.get_running_loop().run_in_executor(None, index.top_k, frame, k)
+        # Missing values (e.g. an unknown Age) become null
+        table = table.astype(object).where(table.notna(), None)
+        return {"patients": table.to_dict(orient="records")}
+
+    async def metrics(self, body):
+        return {
+            "latency_ms": {path: hist.to_dict() for path, hist in self.latency.items()},
+            "batch_size": self.batcher.batch_sizes.to_dict(),
+            "model": self.registry.info(),
+            "audit": AUDIT_LOG.stats(),
+        }
+
+    async def health(self, body):
+        return {
+            "status": "ok",
+            "model_version": self.registry.current().version,
+            "cohort_version": load_store(self.data_path).version[:12],
+        }
+
+    # -----------------------
+    # ASGI plumbing
+    # -----------------------
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        start = time.perf_counter()
+        status, payload = 200, None
+        handler = self.routes.get((scope["method"], scope["path"]))
+        try:
+            if handler is None:
+                raise HTTPError(404, "Not found")
+            body = {}
+            if scope["method"] == "POST":
+                raw = await _read_body(receive)
+                try:
+                    body = json.loads(raw or b"{}")
+                except json.JSONDecodeError:
+                    raise HTTPError(400, "Body is not valid JSON")
+                if not isinstance(body, dict):
+                    raise HTTPError(422, "Body must be a JSON object")
+            payload = await handler(body)
+        except HTTPError as exc:
+            status, payload = exc.status, {"detail": exc.detail}
+        except Exception as exc:
+            status, payload = 500, {"detail": f"{type(exc).__name__}: {exc}"}
+
+        data = json.dumps(payload).encode()
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(b"content-type", b"application/json"),
+                                (b"content-length", str(len(data)).encode())]})
+        await send({"type": "http.response.body", "body": data})
+        if handler is not None:
+            hist = self.latency.setdefault(scope["path"], Histogram(LATENCY_BUCKETS_MS))
+            hist.observe((time.perf_counter() - start) * 1000)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                # Warm the model, cohort and similarity index before taking traffic.
+                self.registry.current()
+                load_store(self.data_path).index()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                await self.batcher.close()
+                AUDIT_LOG.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            return b"".join(chunks)
+
+
+app = ScoringService()
@@ -0,0 +1,228 @@
+"""Top-k "similar patients" index over the reference cohort.
+
+The cohort is encoded once (Age and Target excluded, as the report always has)
+into a contiguous, L2-normalised float32 matrix, so cosine similarity becomes
+a dot product.  Search is delegated to a pluggable backend:
+
+* ``bitset`` - exact (default); the one-hot rows are packed into uint64
+  bitsets and scored with AND + popcount (see :class:`BitsetBackend`).
+  Needs every similarity feature to be categorical.
+* ``brute``  - exact; one float32 mat-vec plus ``argpartition``.
+* ``ivf``    - approximate inverted-file index; rows are bucketed by a k-means
+  coarse quantizer and only the ``nprobe`` closest buckets are scanned.
+
+``python -m benchmarks.bitset`` checks that ``bitset`` ranks exactly like
+``brute`` and reports memory and throughput of both.
+
+The app does not fit an index per cohort itself; it opens the memory-mapped
+one in :mod:`cohort_store`.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from cohort import TARGET
+from projection import as_str_categories, make_preprocessor, split_columns
+
+EXCLUDE = (TARGET, 'Age')
+LABELS = {0: 'CONTROL', 1: 'CASE'}
+# Stored Age (int16, whole years) of a patient without one; see cohort_store.
+AGE_MISSING = np.iinfo(np.int16).min
+# Cosines closer than this are ties (float32 rounding is ~1e-7).
+TIE_TOLERANCE = 1e-6
+DEFAULT_BACKEND = os.environ.get("MYHEARTRISK_SIMILARITY_BACKEND", "bitset")
+
+
+def normalize_rows(matrix):
+    """Return ``matrix`` as C-contiguous float32 with unit-length rows."""
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def pack_rows(onehot):
+    """Pack 0/1 rows into uint64 bitsets, ``ceil(width / 64)`` words per row."""
+    bits = np.packbits(np.asarray(onehot) != 0, axis=1, bitorder="little")
+    packed = np.zeros((len(bits), -(-bits.shape[1] // 8) * 8), dtype=np.uint8)
+    packed[:, :bits.shape[1]] = bits
+    return packed.view(np.uint64)
+
+
+def unpack_rows(packed, width):
+    """Inverse of :func:`pack_rows`: a float32 0/1 matrix of ``width`` columns."""
+    bits = np.unpackbits(np.ascontiguousarray(packed).view(np.uint8), axis=1, bitorder="little")
+    return bits[:, :width].astype(np.float32)
+
+
+_BYTE_BITS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _byte_table_count(words):
+    """Set bits per uint64 word via a 256-entry table (``np.bitwise_count`` needs NumPy 2)."""
+    words = np.ascontiguousarray(words, dtype=np.uint64)
+    return _BYTE_BITS[words.view(np.uint8).reshape(*words.shape, 8)].sum(axis=-1, dtype=np.uint8)
+
+
+bit_count = getattr(np, "bitwise_count", _byte_table_count)
+
+
+def top_k_scores(scores, k):
+    """Indices of the ``k`` largest ``scores``, best first (ties by row order).
+
+    Scores within ``TIE_TOLERANCE`` of each other count as tied, so float32
+    rounding cannot reorder equal cosines: every backend ranks the same rows
+    in the same order.
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k < len(scores):
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        candidates = np.flatnonzero(scores >= kth - TIE_TOLERANCE)
+    else:
+        candidates = np.arange(len(scores))
+    by_score = candidates[np.argsort(-scores[candidates], kind="stable")]
+    # Chain neighbours closer than the tolerance into tie groups
+    group = np.concatenate(([0], np.cumsum(np.diff(-scores[by_score]) > TIE_TOLERANCE)))
+    return by_score[np.lexsort((by_score, group))][:k]
+
+
+class BruteForceBackend:
+    """Exact search: score every row."""
+
+    name = "brute"
+    packed = False
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+
+    def search(self, query, k):
+        scores = np.asarray(self.matrix @ query)
+        idx = top_k_scores(scores, k)
+        return idx, scores[idx]
+
+
+class IVFBackend:
+    """Approximate search over k-means buckets of the cohort."""
+
+    name = "ivf"
+    packed = False
+
+    def __init__(self, matrix, n_lists=None, nprobe=4, random_state=0):
+        from sklearn.cluster import MiniBatchKMeans
+
+        self.matrix = matrix
+        n_lists = n_lists or max(1, int(np.sqrt(len(matrix))))
+        self.nprobe = min(nprobe, n_lists)
+        kmeans = MiniBatchKMeans(n_clusters=n_lists, random_state=random_state, n_init=3)
+        assignment = kmeans.fit_predict(matrix)
+        self.centroids = normalize_rows(kmeans.cluster_centers_)
+        # Rows sorted by bucket, with offsets, so each bucket is one slice.
+        self.order = np.argsort(assignment, kind="stable")
+        self.offsets = np.searchsorted(assignment[self.order], np.arange(n_lists + 1))
+
+    def search(self, query, k):
+        probes = top_k_scores(self.centroids @ query, self.nprobe)
+        rows = np.concatenate([self.order[self.offsets[p]:self.offsets[p + 1]] for p in probes])
+        if len(rows) < k:
+            rows = self.order
+        scores = np.asarray(self.matrix[rows] @ query)
+        best = top_k_scores(scores, k)
+        return rows[best], scores[best]
+
+
+class BitsetBackend:
+    """Exact search over one-hot rows packed by :func:`pack_rows`.
+
+    For 0/1 vectors ``cos(a, b) = |a & b| / sqrt(|a| |b|)``, so an AND and a
+    popcount per 64-bit word give the same scores as the float32 dot product
+    of the normalised rows, from 1/32 of the memory.
+    """
+
+    name = "bitset"
+    packed = True
+
+    def __init__(self, matrix):
+        self.matrix = matrix
+        self.inv_norms = 1 / np.sqrt(np.maximum(self._popcount(matrix), 1), dtype=np.float32)
+
+    @staticmethod
+    def _popcount(words):
+        """Set bits per row (skips the reduction for the common one-word rows)."""
+        if words.shape[1] == 1:
+            return bit_count(words[:, 0])
+        return bit_count(words).sum(axis=1, dtype=np.int32)
+
+    def search(self, query, k):
+        scores = self._popcount(self.matrix & query) * self.inv_norms
+        scores *= np.float32(1 / np.sqrt(max(int(bit_count(query).sum()), 1)))
+        idx = top_k_scores(scores, k)
+        return idx, scores[idx]
+
+
+BACKENDS = {
+    BitsetBackend.name: BitsetBackend,
+    BruteForceBackend.name: BruteForceBackend,
+    IVFBackend.name: IVFBackend,
+}
+
+
+class SimilarityIndex:
+    """Encoded cohort plus a search backend.
+
+    ``matrix`` is packed (:func:`pack_rows`) for backends with ``packed = True``
+    and L2-normalised float32 otherwise.
+    """
+
+    def __init__(self, features, categorical_cols, preprocessor, matrix, age, target,
+                 backend=DEFAULT_BACKEND, **backend_options):
+        self.features = features
+        self.categorical_cols = categorical_cols
+        self.preprocessor = preprocessor
+        self.matrix = matrix
+        self.age = age
+        self.target = target
+        self.packed = BACKENDS[backend].packed
+        self.backend = BACKENDS[backend](self.matrix, **backend_options)
+
+    @classmethod
+    def fit(cls, frame, backend=DEFAULT_BACKEND, **backend_options):
+        """Fit the encoder on ``frame`` and index its rows."""
+        features = [col for col in frame.columns if col not in EXCLUDE]
+        numerical_cols, categorical_cols = split_columns(frame[features], exclude=EXCLUDE)
+        preprocessor = make_preprocessor(numerical_cols, categorical_cols)
+        if BACKENDS[backend].packed and numerical_cols:
+            raise ValueError(f"The '{backend}' similarity backend needs categorical features only; "
+                             f"numeric: {', '.join(numerical_cols)}")
+        encoded = preprocessor.fit_transform(as_str_categories(frame[features], categorical_cols))
+        encoded = encoded.toarray() if hasattr(encoded, "toarray") else encoded
+        matrix = pack_rows(encoded) if BACKENDS[backend].packed else normalize_rows(encoded)
+        return cls(features, categorical_cols, preprocessor, matrix,
+                   frame['Age'].to_numpy(), frame[TARGET].to_numpy(), backend=backend, **backend_options)
+
+    def encode(self, rows):
+        """Encode raw feature rows like the index's matrix (packed or normalised)."""
+        rows = as_str_categories(rows[self.features], self.categorical_cols)
+        encoded = self.preprocessor.transform(rows)
+        encoded = encoded.toarray() if hasattr(encoded, "toarray") else encoded
+        return pack_rows(encoded) if self.packed else normalize_rows(encoded)
+
+    def search(self, user_df, k=10):
+        """Return ``(row_indices, cosine_similarities)`` of the ``k`` nearest patients."""
+        query = self.encode(user_df)[0]
+        return self.backend.search(query, k)
+
+    def top_k(self, user_df, k=10):
+        """The report table: Age, CASE/CONTROL label and similarity for the top ``k``."""
+        idx, scores = self.search(user_df, k)
+        age = self.age[idx]
+        if np.issubdtype(age.dtype, np.integer):
+            age = pd.arrays.IntegerArray(age.astype(np.int16), age == AGE_MISSING)
+        return pd.DataFrame({
+            'Age': age,
+            'Target': pd.Series(self.target[idx]).map(LABELS),
+            'Similarity (%)': [f"{s * 100:.2f}" for s in scores],
+        })
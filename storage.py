@@ -0,0 +1,19 @@
+"""On-disk cache location and content hashing for the cached artifacts.
+
+Standard library only, so modules on the landing-page path (e.g.
+:mod:`assets`) can use it without importing pandas via :mod:`cohort`.
+"""
+import hashlib
+import os
+
+mainpath = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.environ.get("MYHEARTRISK_CACHE_DIR", os.path.join(mainpath, ".cache"))
+
+
+def file_hash(path, chunk_size=1 << 20):
+    """Return the SHA-256 hex digest of ``path``."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
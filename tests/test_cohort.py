@@ -0,0 +1,43 @@
+"""Snapshot caching of the reference cohort."""
+import os
+import threading
+
+import pandas as pd
+import pytest
+
+import cohort
+from cohort import DEFAULT_DATA_PATH, read_cohort
+from cohort_sources import load_source
+from schema import load_manifest
+
+
+@pytest.fixture
+def cold_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cohort, "CACHE_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_read_cohort_from_many_threads_on_a_cold_cache(cold_cache):
+    # The app's script thread, report workers and warm-up thread all race here
+    threads, frames, errors = 8, [], []
+    barrier = threading.Barrier(threads)
+
+    def read():
+        barrier.wait()
+        try:
+            frames.append(read_cohort(DEFAULT_DATA_PATH))
+        except Exception as exc:
+            errors.append(exc)
+
+    workers = [threading.Thread(target=read) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert errors == []
+    expected, _ = load_source(DEFAULT_DATA_PATH, manifest=load_manifest())
+    for frame in frames:
+        pd.testing.assert_frame_equal(frame, expected)
+    snapshots = os.listdir(cold_cache / "cohort")
+    assert len(snapshots) == 1 and snapshots[0].endswith(".parquet")
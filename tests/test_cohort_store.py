@@ -0,0 +1,86 @@
+"""Incremental ingestion and compaction of the memory-mapped cohort store."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import cohort
+import cohort_cube
+import cohort_store
+from benchmarks.synthetic import synthetic_cohort
+from cohort import TARGET, read_cohort
+from cohort_cube import CountCube, load_cube
+from cohort_store import compact, ingest, load_store, stored_frame
+
+
+@pytest.fixture
+def store_cache(tmp_path, monkeypatch):
+    for module in (cohort, cohort_store, cohort_cube):
+        monkeypatch.setattr(module, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(cohort_store, "_stores", {})
+    monkeypatch.setattr(cohort_cube, "_cubes", {})
+    return tmp_path
+
+
+@pytest.fixture
+def batch(store_cache):
+    return synthetic_cohort(30, reference=read_cohort(), seed=2)
+
+
+def _state(store):
+    with open(os.path.join(store.directory, "state.json"), "rb") as fh:
+        return fh.read()
+
+
+def test_ingest_appends_rows(batch):
+    before = load_store()
+    after = ingest(batch)
+    assert after.rows == before.rows + len(batch)
+    assert after.pending == len(batch)
+    assert after.version != before.version
+    np.testing.assert_array_equal(after.age[before.rows:], batch["Age"])
+    np.testing.assert_array_equal(after.target[before.rows:], batch[TARGET])
+    assert len(after.projection.coords) == after.rows
+    assert len(stored_frame()) == after.rows
+    # Readers of the previous state keep their own view
+    assert before.rows == len(before.age)
+
+
+def test_compact_keeps_rows_and_version(batch):
+    ingested = ingest(batch)
+    compacted = compact()
+    assert compacted.rows == ingested.rows
+    assert compacted.version == ingested.version
+    assert compacted.pending == 0
+    assert compacted.generation_name != ingested.generation_name
+    # The coordinates are refit, so fitted results must not be reused
+    assert compacted.fit_version != ingested.fit_version
+    np.testing.assert_array_equal(compacted.age, ingested.age)
+
+
+@pytest.mark.parametrize("problem", ["target", "missing column"])
+def test_invalid_batch_leaves_the_store_unchanged(batch, problem):
+    store = ingest(batch)
+    state, batches = _state(store), sorted(os.listdir(os.path.join(store.root, "batches")))
+    bad = batch.copy()
+    if problem == "target":
+        bad.loc[3, TARGET] = 2
+    else:
+        bad = bad.drop(columns=bad.columns[0])
+    with pytest.raises(ValueError):
+        ingest(bad)
+    assert _state(store) == state
+    assert sorted(os.listdir(os.path.join(store.root, "batches"))) == batches
+    assert load_store().rows == store.rows
+
+
+def test_cube_after_ingest_matches_combined_frame(batch):
+    load_cube()
+    ingest(batch)
+    cube = load_cube()
+    expected = CountCube.from_frame(pd.concat([read_cohort(), batch], ignore_index=True))
+    assert cube.features == expected.features
+    assert cube.levels == expected.levels
+    np.testing.assert_array_equal(cube.counts, expected.counts)
+    np.testing.assert_array_equal(cube.totals, expected.totals)
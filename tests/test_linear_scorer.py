@@ -0,0 +1,74 @@
+"""Parity of the compiled NumPy scorer with the deployed sklearn pipeline."""
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import synthetic_cohort
+from cohort import DEFAULT_DATA_PATH, TARGET
+from cohort_sources import load_source
+from linear_scorer import LinearScorer
+from model_registry import DEFAULT_MODEL_PATH, get_registry
+from schema import load_manifest
+
+ATOL = 1e-12
+
+
+@pytest.fixture(scope="module")
+def loaded():
+    return get_registry(DEFAULT_MODEL_PATH).current()
+
+
+@pytest.fixture(scope="module")
+def scorer(loaded, tmp_path_factory):
+    # Through the .npz artifact, as the app loads it
+    path = str(tmp_path_factory.mktemp("scorer") / "model.npz")
+    LinearScorer.from_pipeline(loaded.model, version=loaded.version).save(path)
+    return LinearScorer.load(path)
+
+
+@pytest.fixture(scope="module")
+def cohort():
+    # Read the source directly so the tests do not write the app's .cache
+    frame, _ = load_source(DEFAULT_DATA_PATH, manifest=load_manifest())
+    return frame
+
+
+@pytest.fixture(scope="module", params=["cohort", "synthetic", "missing/unseen"])
+def frame(request, cohort):
+    features = cohort.drop(columns=TARGET)
+    if request.param == "cohort":
+        return features
+    if request.param == "synthetic":
+        return synthetic_cohort(2_000, reference=cohort, seed=1).drop(columns=TARGET)
+    # Missing and unseen values must fall through exactly as in sklearn
+    edge = features.head(20).astype(object)
+    edge.iloc[::2, 1:] = None
+    edge.iloc[1::2, 2] = "unseen level"
+    edge.iloc[::3, 0] = np.nan
+    return edge
+
+
+def test_predict_proba_matches_pipeline(loaded, scorer, frame):
+    np.testing.assert_allclose(scorer.predict_proba(frame), loaded.model.predict_proba(frame), rtol=0, atol=ATOL)
+
+
+def test_predict_proba_dict_matches_pipeline(loaded, scorer, frame):
+    single = np.array([scorer.predict_proba_dict(row) for row in frame.to_dict(orient="records")])
+    np.testing.assert_allclose(single, loaded.model.predict_proba(frame), rtol=0, atol=ATOL)
+
+
+def test_array_path_matches_pipeline(loaded, scorer, frame):
+    array = frame[scorer.feature_order].to_numpy(dtype=object)
+    np.testing.assert_allclose(scorer.predict_proba(array), loaded.model.predict_proba(frame), rtol=0, atol=ATOL)
+
+
+def test_predict_matches_pipeline(loaded, scorer, frame):
+    np.testing.assert_array_equal(scorer.predict(frame), loaded.model.predict(frame))
+
+
+def test_feature_terms_add_up_to_decision(loaded, scorer, frame):
+    logits = scorer.intercept + scorer.feature_terms(frame).sum(axis=1)
+    np.testing.assert_allclose(logits, loaded.model.decision_function(frame), rtol=0, atol=1e-9)
+
+
+def test_artifact_records_model_version(loaded, scorer):
+    assert scorer.version == loaded.version
@@ -0,0 +1,238 @@
+"""Offline training and cross-validation for MyHeartRisk.
+
+Reproduces ``model.joblib`` and the numbers on the Model Performance tab::
+
+    python train.py                      # all cores, writes model.joblib + metrics.json
+    python train.py --workers 1          # serial, for comparison
+
+Two validation schemes run on the reference cohort:
+
+* the 10-model comparison, 5-fold stratified CV;
+* internal validation of the deployed Logistic Regression, 5x2 stratified CV
+  (5 repeats of 2 folds).
+
+Every (model, fold) pair is an independent task executed in a process pool.
+Each finished fold is cached under ``.cache/train`` keyed by the cohort
+version, the full pipeline's parameters and column split, the fold and the
+sklearn version, so a rerun only recomputes what changed.  The deployed model
+is then refitted on the whole cohort.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import sklearn
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import (AdaBoostClassifier, BaggingClassifier, ExtraTreesClassifier,
+                              GradientBoostingClassifier, RandomForestClassifier)
+from sklearn.impute import SimpleImputer
+from sklearn.linear_model import LogisticRegression, PassiveAggressiveClassifier, RidgeClassifier
+from sklearn.metrics import confusion_matrix, matthews_corrcoef
+from sklearn.model_selection import RepeatedStratifiedKFold, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from sklearn.svm import LinearSVC
+from sklearn.tree import DecisionTreeClassifier
+
+from cohort import CACHE_DIR, DEFAULT_DATA_PATH, TARGET, load_cohort
+from model_registry import DEFAULT_MODEL_PATH
+from schema import CATEGORICAL, DEFAULT_SCHEMA_PATH, load_manifest
+
+mainpath = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_METRICS_PATH = os.path.join(mainpath, r'metrics.json')
+DEPLOYED = "Logistic Regression"
+RANDOM_STATE = 42
+
+# The classifiers of Comparison.jpg, in its order
+MODELS = {
+    "Logistic Regression": lambda: LogisticRegression(max_iter=5000, random_state=RANDOM_STATE),
+    "Ridge Classifier": lambda: RidgeClassifier(),
+    "Random Forest": lambda: RandomForestClassifier(random_state=RANDOM_STATE),
+    "AdaBoost": lambda: AdaBoostClassifier(random_state=RANDOM_STATE),
+    "Passive Aggressive": lambda: PassiveAggressiveClassifier(random_state=RANDOM_STATE),
+    "Linear SVC": lambda: LinearSVC(random_state=RANDOM_STATE),
+    "Extra Trees": lambda: ExtraTreesClassifier(random_state=RANDOM_STATE),
+    "Gradient Boosting": lambda: GradientBoostingClassifier(random_state=RANDOM_STATE),
+    "Bagging": lambda: BaggingClassifier(random_state=RANDOM_STATE),
+    "Decision Tree": lambda: DecisionTreeClassifier(random_state=RANDOM_STATE),
+}
+
+SCHEMES = {
+    "5-fold stratified": lambda: StratifiedKFold(n_splits=5, shuffle=True, random_state=RANDOM_STATE),
+    "5x2 stratified": lambda: RepeatedStratifiedKFold(n_splits=2, n_repeats=5, random_state=RANDOM_STATE),
+}
+COMPARISON_SCHEME = "5-fold stratified"
+INTERNAL_SCHEME = "5x2 stratified"
+
+
+def make_pipeline(name, numerical_cols, categorical_cols):
+    """The deployed preprocessing in front of classifier ``name``."""
+    preproc = ColumnTransformer(transformers=[
+        ('num', Pipeline(steps=[
+            ('imputer', SimpleImputer(strategy='median')),
+            ('scaler', StandardScaler())
+        ]), numerical_cols),
+        ('cat', Pipeline(steps=[
+            ('imputer', SimpleImputer(strategy='constant', fill_value='Missing')),
+            # Dense output for the comparison models; the deployed one keeps it sparse
+            ('onehot', OneHotEncoder(handle_unknown='ignore', sparse_output=name == DEPLOYED))
+        ]), categorical_cols),
+    ])
+    return Pipeline(steps=[('preproc', preproc), ('clf', MODELS[name]())])
+
+
+def fold_metrics(y_true, y_pred):
+    tn, fp, fn, tp = confusion_matrix(y_true, y_pred, labels=[0, 1]).ravel()
+    return {
+        "accuracy": (tp + tn) / len(y_true),
+        "sensitivity": tp / (tp + fn) if tp + fn else 0.0,
+        "specificity": tn / (tn + fp) if tn + fp else 0.0,
+        "mcc": matthews_corrcoef(y_true, y_pred),
+    }
+
+
+# -----------------------
+# Tasks and the per-fold cache
+# -----------------------
+def task_key(cohort_version, name, scheme, fold, numerical_cols, categorical_cols):
+    # The whole pipeline (preprocessing included) and the column split, not just the classifier
+    params = repr(sorted(make_pipeline(name, numerical_cols, categorical_cols).get_params().items()))
+    raw = json.dumps([cohort_version, name, params, list(numerical_cols), list(categorical_cols),
+                      scheme, fold, sklearn.__version__])
+    return hashlib.sha256(raw.encode()).hexdigest()[:24]
+
+
+def _cache_path(key):
+    return os.path.join(CACHE_DIR, "train", f"{key}.json")
+
+
+_data = {}
+
+
+def _init_worker(X, y, numerical_cols, categorical_cols):
+    _data.update(X=X, y=y, numerical_cols=numerical_cols, categorical_cols=categorical_cols)
+
+
+def run_fold(task):
+    """Fit and score one (model, scheme, fold); executed in a worker process."""
+    name, scheme, fold, train_idx, test_idx = task
+    X, y = _data["X"], _data["y"]
+    numerical_cols, categorical_cols = _data["numerical_cols"], _data["categorical_cols"]
+    start, cpu_start = time.perf_counter(), time.process_time()
+    pipeline = make_pipeline(name, numerical_cols, categorical_cols)
+    pipeline.fit(X.iloc[train_idx], y[train_idx])
+    metrics = fold_metrics(y[test_idx], pipeline.predict(X.iloc[test_idx]))
+    return {"model": name, "scheme": scheme, "fold": fold,
+            "seconds": time.perf_counter() - start, "cpu_seconds": time.process_time() - cpu_start,
+            **{k: float(v) for k, v in metrics.items()}}
+
+
+def run_cv(cohort, manifest, workers):
+    """Run every (model, fold) task, reusing cached folds; return (results, stats)."""
+    X = cohort.frame[[c["name"] for c in manifest["columns"]]]
+    y = cohort.frame[TARGET].to_numpy().astype(int)
+    categorical_cols = [c["name"] for c in manifest["columns"] if c["kind"] == CATEGORICAL]
+    numerical_cols = [c for c in X.columns if c not in categorical_cols]
+
+    plan = [(name, COMPARISON_SCHEME) for name in MODELS]
+    plan.append((DEPLOYED, INTERNAL_SCHEME))
+
+    results, pending = [], []
+    for name, scheme in plan:
+        for fold, (train_idx, test_idx) in enumerate(SCHEMES[scheme]().split(X, y)):
+            key = task_key(cohort.version, name, scheme, fold, numerical_cols, categorical_cols)
+            if os.path.exists(_cache_path(key)):
+                with open(_cache_path(key), encoding="utf-8") as fh:
+                    results.append(json.load(fh))
+            else:
+                pending.append((key, (name, scheme, fold, train_idx, test_idx)))
+
+    shared = (X, y, numerical_cols, categorical_cols)
+    start = time.perf_counter()
+    if workers > 1 and len(pending) > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=shared) as pool:
+            computed = list(pool.map(run_fold, [task for _, task in pending]))
+    else:
+        _init_worker(*shared)
+        computed = [run_fold(task) for _, task in pending]
+    wall = time.perf_counter() - start
+
+    os.makedirs(os.path.join(CACHE_DIR, "train"), exist_ok=True)
+    for (key, _), result in zip(pending, computed):
+        with open(_cache_path(key), "w", encoding="utf-8") as fh:
+            json.dump(result, fh)
+    results.extend(computed)
+
+    # Sum of per-task CPU time: what the same work costs run serially on one
+    # core (wall time per task is inflated when workers share cores).
+    serial = sum(r["cpu_seconds"] for r in computed)
+    stats = {
+        "tasks": len(results),
+        "computed": len(computed),
+        "cached": len(results) - len(computed),
+        "workers": workers,
+        "wall_seconds": wall,
+        "serial_seconds": serial,
+        "speedup": serial / wall if wall > 0 and computed else None,
+    }
+    return results, stats
+
+
+def summarize(results, name, scheme):
+    folds = [r for r in results if r["model"] == name and r["scheme"] == scheme]
+    return {metric: {"mean": float(np.mean([f[metric] for f in folds])),
+                     "std": float(np.std([f[metric] for f in folds]))}
+            for metric in ("accuracy", "sensitivity", "specificity", "mcc")}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cross-validate the candidate models and train model.joblib.")
+    parser.add_argument("--data", default=DEFAULT_DATA_PATH)
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA_PATH)
+    parser.add_argument("--model-out", default=DEFAULT_MODEL_PATH)
+    parser.add_argument("--metrics-out", default=DEFAULT_METRICS_PATH)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    cohort = load_cohort(args.data)
+    manifest = load_manifest(args.schema)
+    results, stats = run_cv(cohort, manifest, args.workers)
+
+    metrics = {
+        "cohort_version": cohort.version[:12],
+        "samples": int(len(cohort.frame)),
+        "deployed_model": DEPLOYED,
+        "internal_validation": {"scheme": INTERNAL_SCHEME, **summarize(results, DEPLOYED, INTERNAL_SCHEME)},
+        "comparison": {"scheme": COMPARISON_SCHEME,
+                       "models": {name: summarize(results, name, COMPARISON_SCHEME) for name in MODELS}},
+    }
+    with open(args.metrics_out, "w", encoding="utf-8") as fh:
+        json.dump(metrics, fh, indent=2)
+        fh.write("\n")
+
+    categorical_cols = [c["name"] for c in manifest["columns"] if c["kind"] == CATEGORICAL]
+    X = cohort.frame[[c["name"] for c in manifest["columns"]]]
+    final = make_pipeline(DEPLOYED, [c for c in X.columns if c not in categorical_cols], categorical_cols)
+    final.fit(X, cohort.frame[TARGET])
+    tmp = f"{args.model_out}.{os.getpid()}.tmp"
+    joblib.dump(final, tmp)
+    os.replace(tmp, args.model_out)
+
+    internal = metrics["internal_validation"]
+    print(f"{DEPLOYED} ({INTERNAL_SCHEME}): accuracy {internal['accuracy']['mean']:.2f} ± "
+          f"{internal['accuracy']['std']:.2f}, MCC {internal['mcc']['mean']:.2f} ± {internal['mcc']['std']:.2f}")
+    print(f"{stats['tasks']} fold tasks: {stats['computed']} computed, {stats['cached']} cached; "
+          f"wall {stats['wall_seconds']:.2f}s on {stats['workers']} worker(s)", end="")
+    if stats["speedup"] is not None:
+        print(f", serial {stats['serial_seconds']:.2f}s, speedup {stats['speedup']:.2f}x", end="")
+    print(f"\nWrote {args.model_out} and {args.metrics_out}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
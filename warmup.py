@@ -0,0 +1,110 @@
+"""Background warm-up of the report path.
+
+The landing page only needs Streamlit and the schema manifest; pandas,
+sklearn, Plotly, the model and the cohort store are first needed when
+"Analyze Risk" is pressed, the count cube when Feature Analysis is opened.
+:func:`start_warmup` loads them on a daemon thread once per process, after
+the first page has been sent, so the first report does not pay for them
+either.  Set ``MYHEARTRISK_WARMUP=0`` to load
+everything on demand instead.
+"""
+import logging
+import os
+import threading
+import time
+
+mainpath = os.path.dirname(os.path.abspath(__file__))
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_done = threading.Event()
+_thread = None
+_timings = {}
+_errors = {}
+
+
+def warmup_enabled():
+    return os.environ.get("MYHEARTRISK_WARMUP", "1").lower() not in ("0", "false", "no")
+
+
+def _import_report_modules():
+    import pandas  # noqa: F401
+
+    import attribution  # noqa: F401
+    import charts  # noqa: F401
+    import linear_scorer  # noqa: F401
+    import report_pipeline  # noqa: F401
+    import what_if  # noqa: F401
+
+
+def _steps(data_path, model_path):
+    from assets import DISPLAY_WIDTHS, optimized_image
+
+    def model():
+        from model_registry import get_registry
+        from attribution import load_attribution
+        loaded = get_registry(model_path).current()
+        # Compiles the linear scorer too, whichever scorer serves predictions
+        load_attribution(loaded, data_path)
+
+    def cohort_store():
+        from charts import load_background
+        from cohort_store import load_store
+        store = load_store(data_path)
+        store.index()
+        load_background(store.fit_version, store.projection)
+
+    def cube():
+        import altair  # noqa: F401  (st.bar_chart in the Cohort Explorer)
+
+        from cohort_cube import load_cube
+        load_cube(data_path)
+
+    def images():
+        for name, width in DISPLAY_WIDTHS.items():
+            optimized_image(os.path.join(mainpath, name), width)
+
+    return (("imports", _import_report_modules), ("model", model),
+            ("cohort_store", cohort_store), ("cube", cube), ("images", images))
+
+
+def _run(data_path, model_path):
+    try:
+        for name, step in _steps(data_path, model_path):
+            start = time.perf_counter()
+            try:
+                step()
+            except Exception as exc:
+                # Warm-up is best effort; the request path loads on demand and reports errors itself.
+                _errors[name] = repr(exc)
+                logger.warning("warm-up step %s failed: %r", name, exc)
+            _timings[name] = time.perf_counter() - start
+    finally:
+        _done.set()
+
+
+def start_warmup(data_path, model_path):
+    """Start the warm-up thread unless it already ran in this process (or is disabled)."""
+    global _thread
+    if _thread is not None or not warmup_enabled():
+        return
+    with _lock:
+        if _thread is None:
+            _thread = threading.Thread(target=_run, args=(data_path, model_path), name="warmup", daemon=True)
+            _thread.start()
+
+
+def wait(timeout=None):
+    """Block until the warm-up has finished (True), or ``timeout`` elapsed (False)."""
+    if _thread is None:
+        return True
+    return _done.wait(timeout)
+
+
+def warmup_status():
+    return {
+        "started": _thread is not None,
+        "done": _done.is_set(),
+        "seconds": {name: round(s, 3) for name, s in _timings.items()},
+        "errors": dict(_errors),
+    }
@@ -0,0 +1,75 @@
+"""What-if sensitivity sweep for a submitted profile.
+
+"What would my risk be if I quit smoking?" - instead of re-running the report
+once per change, the submitted profile is expanded into every single-feature
+alternative (each other level of every categorical input, and a grid over
+each numeric input such as Age), all variants are scored in one batched
+``predict_proba`` call, and the changes are ranked by how much they move the
+predicted risk::
+
+    table = sweep(model, manifest, user_data)             # sklearn pipeline
+    table = sweep(model, manifest, user_data, scorer)     # compiled LinearScorer
+
+The deltas are the model's associations for this profile, one factor at a
+time; they are not causal effects.
+"""
+from schema import CATEGORICAL, input_rows
+
+# Numeric inputs are swept over this many evenly spaced whole values
+GRID_POINTS = 9
+
+
+def numeric_grid(column, points=GRID_POINTS):
+    """Whole-number grid over ``[min, max]`` of a numeric manifest column."""
+    low, high = int(round(column["min"])), int(round(column["max"]))
+    if points < 2 or high <= low:
+        return [low]
+    step = (high - low) / (points - 1)
+    return sorted({int(round(low + i * step)) for i in range(points)})
+
+
+def variants(manifest, user_data, points=GRID_POINTS):
+    """Every single-feature alternative to ``user_data``.
+
+    Returns ``(changes, rows)``: ``changes[i]`` is ``(feature, current, alternative)``
+    and ``rows[i]`` the full profile with that one feature changed.
+    """
+    changes, rows = [], []
+    for column in manifest["columns"]:
+        name = column["name"]
+        current = user_data.get(name)
+        if column["kind"] == CATEGORICAL:
+            alternatives = [level for level in column["levels"] if level != str(current)]
+        else:
+            alternatives = [value for value in numeric_grid(column, points) if current is None or value != current]
+        for value in alternatives:
+            changes.append((name, current, value))
+            rows.append({**user_data, name: value})
+    return changes, rows
+
+
+def sweep(model, manifest, user_data, scorer=None, points=GRID_POINTS):
+    """Score the profile and all its variants in one call; return the ranked delta table.
+
+    With a :class:`linear_scorer.LinearScorer` the rows are scored straight
+    from the dicts, otherwise ``model.predict_proba`` gets one input frame.
+    Rows are sorted by the change in the predicted probability of CAD,
+    largest decrease first.
+    """
+    import pandas as pd
+
+    changes, rows = variants(manifest, user_data, points)
+    rows = [user_data] + rows
+    if scorer is not None:
+        proba = scorer.predict_proba_dicts(rows)
+    else:
+        proba = model.predict_proba(input_rows(manifest, rows))
+    risk = proba[:, 1] * 100
+    table = pd.DataFrame({
+        "Feature": [feature for feature, _, _ in changes],
+        "Current": [str(current) for _, current, _ in changes],
+        "What if": [str(value) for _, _, value in changes],
+        "Risk (%)": risk[1:],
+        "Change (pp)": risk[1:] - risk[0],
+    })
+    return table.sort_values("Change (pp)", kind="stable", ignore_index=True).round(1)